@@ -2,13 +2,23 @@
 
 from external.streamlit import st
 from services.ai_service import AIService
+from services.refresh_service import RefreshService
+from utils.async_utils import AsyncUtils
+from utils.metrics import Metrics
+from utils.tenant_utils import TenantUtils
 
-ai_service = AIService()
+ai_service = AIService.get_instance()
+# Starts the link refresh scheduler and metrics endpoint once per process
+RefreshService.get_instance()
+Metrics.start_server()
+tenant = TenantUtils.select_tenant()
 
 st.title("💬 Ragify Chat")
 
-if "messages" not in st.session_state:
+# A conversation belongs to the knowledge base it was held against
+if "messages" not in st.session_state or st.session_state.get("chat_tenant") != tenant:
     st.session_state.messages = []
+    st.session_state.chat_tenant = tenant
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -20,8 +30,8 @@ if prompt := st.chat_input("Ask me anything"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        response_stream = ai_service.generate_response(
-            prompt, st.session_state.messages
+        response_stream = AsyncUtils.iterate(
+            ai_service.agenerate_response(prompt, tenant, st.session_state.messages)
         )
         response_text = st.write_stream(response_stream)
 
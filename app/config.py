@@ -1,6 +1,7 @@
 # app/config.py
 
 import os
+from typing import Dict
 
 from pydantic_settings import BaseSettings
 
@@ -20,6 +21,59 @@ class Settings(BaseSettings):
     LANGSMITH_ENDPOINT: str
     LANGSMITH_API_KEY: str
     LANGSMITH_PROJECT: str
+    DEFAULT_TENANT: str = "default"
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_TRANSFER_MAX_WORKERS: int = 8
+    S3_MULTIPART_THRESHOLD_MB: int = 16
+    S3_MULTIPART_CHUNKSIZE_MB: int = 16
+    S3_MULTIPART_MAX_CONCURRENCY: int = 8
+    S3_MANIFEST_TTL_SECONDS: float = 300
+    S3_PRESIGNED_URL_EXPIRY_SECONDS: int = 3600
+    EMBEDDING_CACHE_PATH: str = ".cache/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+    EMBEDDING_DIMENSIONS: int = 1536
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_MAX_CONCURRENT_BATCHES: int = 4
+    VECTOR_BACKEND: str = "qdrant"
+    NUMPY_INDEX_PATH: str = ".cache/vector_index"
+    QDRANT_COLLECTION_PROFILE: str = "balanced"
+    QDRANT_HNSW_EF: int = 0
+    QDRANT_TENANT_INDEXING: bool = True
+    SEARCH_TOP_K: int = 3
+    SEARCH_TUNING_PATH: str = "search_tuning.json"
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_PREFETCH_LIMIT: int = 20
+    HIERARCHICAL_SEARCH_ENABLED: bool = True
+    HIERARCHICAL_MIN_SOURCES: int = 1000
+    HIERARCHICAL_SOURCE_LIMIT: int = 20
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    HISTORY_TOKEN_BUDGET: int = 2000
+    QUERY_REWRITE_ENABLED: bool = False
+    QUERY_EXPANSION_COUNT: int = 0
+    QUERY_REWRITE_TIMEOUT_SECONDS: float = 1.5
+    QUERY_REWRITE_HISTORY_TOKENS: int = 800
+    QUERY_CACHE_MAX_ENTRIES: int = 1024
+    QUERY_CACHE_TTL_SECONDS: float = 3600
+    WEB_FETCH_MAX_CONCURRENCY: int = 16
+    WEB_FETCH_PER_HOST_LIMIT: int = 2
+    WEB_FETCH_HOST_DELAY_SECONDS: float = 0.5
+    WEB_FETCH_TIMEOUT_SECONDS: float = 30
+    EXTRACTION_MAX_WORKERS: int = 0
+    EXTRACTION_MAX_FILES: int = 16
+    PDF_PAGES_PER_TASK: int = 25
+    CHUNKING_OVERRIDES: Dict[str, Dict[str, int]] = {}
+    CHUNKING_BATCH_CHARS: int = 200_000
+    INGESTION_MAX_WORKERS: int = 2
+    INGESTION_ITEMS_PER_STEP: int = 8
+    INGESTION_PROGRESS_POLL_SECONDS: float = 2
+    LINK_REFRESH_ENABLED: bool = True
+    LINK_REFRESH_INTERVAL_SECONDS: float = 86400
+    LINK_REFRESH_CHECK_SECONDS: float = 900
+    LINK_REFRESH_BATCH_SIZE: int = 500
+    LINK_REFRESH_MAX_CONCURRENCY: int = 4
+    METRICS_ENABLED: bool = True
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9464
 
     class Config:
         env_file = ".env"
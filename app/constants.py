@@ -1,5 +1,64 @@
 # app/constants.py
 
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
-OPENAI_EMBEDDING_DIMENSION = 1536
+# Used for chunk sizes and the chat context and history budgets alike
+TOKENIZER_ENCODING = "cl100k_base"
+SPARSE_VECTOR_NAME = "langchain-sparse"
+SOURCE_FIELDS = ["source_url", "source_filename"]
+INDEXED_METADATA_FIELDS = [f"metadata.{field}" for field in SOURCE_FIELDS]
+TENANT_FIELD = "metadata.tenant_id"
+TENANT_KEY_PREFIX = "tenants/"
+# Record that the move to per-tenant storage ran, so later starts skip it
+TENANT_MIGRATION_MARKER_KEY = "migrations/tenant_prefixes"
+TENANT_MIGRATION_ALIAS_SUFFIX = "_tenants_assigned"
+# Points at the new collection while the old one is deleted mid-migration
+MIGRATION_ALIAS_SUFFIX = "_migrating"
+MIGRATION_COMMAND = "python app/migrate.py"
+# Added when a migration to sparse vectors keeps the dimension of the collection
+SPARSE_MIGRATION_SUFFIX = "_hybrid"
+SOURCE_COLLECTION_SUFFIX = "_sources"
+# Records that the summaries of every stored source have been built
+SOURCE_SUMMARIES_ALIAS_SUFFIX = "_summaries_built"
+SOURCE_SUMMARIES_MARKER = "summaries_built"
+VECTOR_BACKENDS = ["qdrant", "numpy"]
+RRF_RANK_CONSTANT = 60
 CHECKPOINTER_CONFIG = {"configurable": {"thread_id": "1"}}
+JOB_KIND_DOCUMENTS = "documents"
+JOB_KIND_LINKS = "links"
+# Originals on disk with quantized copies in RAM; searches rescore the
+# oversampled candidates against the originals to keep recall
+COLLECTION_PROFILES = {
+    "default": {
+        "quantization": None,
+        "on_disk": False,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_ef": None,
+        "oversampling": None,
+    },
+    "balanced": {
+        "quantization": "scalar",
+        "on_disk": True,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "hnsw_ef": 128,
+        "oversampling": 2.0,
+    },
+    "compact": {
+        "quantization": "binary",
+        "on_disk": True,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "hnsw_ef": 128,
+        "oversampling": 3.0,
+    },
+}
+# Sizes are in embedding tokens; CHUNKING_OVERRIDES in the settings replaces
+# them per source type
+CHUNKING_PROFILES = {
+    "text": {"chunk_size": 400, "chunk_overlap": 40},
+    "pdf": {"chunk_size": 400, "chunk_overlap": 40},
+    "webpage": {"chunk_size": 300, "chunk_overlap": 30},
+}
+# Headings first, then paragraphs, lines, sentences and words
+CHUNKING_SEPARATORS = [r"\n#{1,6} ", r"\n\s*\n", r"\n", r"(?<=[.!?]) ", " ", ""]
@@ -0,0 +1,119 @@
+# app/database/clients.py
+
+import atexit
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, TypeVar
+
+import boto3
+from botocore.config import Config
+from config import settings
+from pymongo import MongoClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from utils.logger import logger
+
+T = TypeVar("T")
+
+
+class ClientRegistry:
+    _instances: Dict[str, Any] = {}
+    _timings: Dict[str, float] = {}
+    _lock = threading.RLock()
+
+    @classmethod
+    def get_or_create(cls, name: str, factory: Callable[[], T]) -> T:
+        instance = cls._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with cls._lock:
+            if name not in cls._instances:
+                start = time.perf_counter()
+                cls._instances[name] = factory()
+                cls._timings[name] = time.perf_counter() - start
+                logger.info(f"Initialized {name} in {cls._timings[name] * 1000:.1f} ms")
+            return cls._instances[name]
+
+    @classmethod
+    def close_all(cls) -> None:
+        # Registered instances are process-wide, so they are released at exit;
+        # async clients are left to the event loop that owns them
+        with cls._lock:
+            for name, instance in cls._instances.items():
+                close = getattr(instance, "close", None)
+                if close is None or inspect.iscoroutinefunction(close):
+                    continue
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Failed to close {name}: {str(e)}")
+            cls._instances.clear()
+
+    @classmethod
+    def get_timings(cls) -> Dict[str, float]:
+        with cls._lock:
+            return dict(cls._timings)
+
+    @classmethod
+    def get_qdrant_client(cls) -> QdrantClient:
+        def create() -> QdrantClient:
+            if settings.PYTHON_ENV.lower() == "prod":
+                logger.info("Connecting to Qdrant Cloud (PROD)")
+                return QdrantClient(
+                    url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY
+                )
+            logger.info("Connecting to Qdrant Local (DEV)")
+            return QdrantClient(url="http://localhost:6333")
+
+        return cls.get_or_create("qdrant_client", create)
+
+    @classmethod
+    def get_async_qdrant_client(cls) -> AsyncQdrantClient:
+        def create() -> AsyncQdrantClient:
+            if settings.PYTHON_ENV.lower() == "prod":
+                return AsyncQdrantClient(
+                    url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY
+                )
+            return AsyncQdrantClient(url="http://localhost:6333")
+
+        return cls.get_or_create("async_qdrant_client", create)
+
+    @classmethod
+    def get_mongo_client(cls) -> MongoClient:
+        def create() -> MongoClient:
+            if settings.PYTHON_ENV.lower() == "prod":
+                logger.info("Connecting to MongoDB Cloud (PROD)")
+                return MongoClient(settings.MONGODB_URI)
+            logger.info("Connecting to MongoDB Local (DEV)")
+            return MongoClient("mongodb://localhost:27017")
+
+        return cls.get_or_create("mongo_client", create)
+
+    @classmethod
+    def get_s3_client(cls) -> Any:
+        def create() -> Any:
+            pool_config = Config(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS)
+            if settings.PYTHON_ENV.lower() == "prod":
+                logger.info("Connecting to AWS S3 (PROD)")
+                return boto3.client(
+                    "s3",
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_REGION,
+                    config=pool_config,
+                )
+            logger.info("Connecting to MinIO Local (DEV)")
+            return boto3.client(
+                "s3",
+                endpoint_url="http://localhost:9000",
+                aws_access_key_id="useradmin",
+                aws_secret_access_key="userpass",
+                region_name="us-east-2",
+                config=pool_config,
+            )
+
+        return cls.get_or_create("s3_client", create)
+
+
+atexit.register(ClientRegistry.close_all)
@@ -0,0 +1,216 @@
+# app/database/embedding_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Tuple
+
+from config import settings
+from langchain_core.embeddings import Embeddings
+from utils.cache_utils import TTLCache
+from utils.hash_utils import HashUtils
+from utils.logger import logger
+from utils.metrics import Metrics
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int) -> None:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self.max_entries = max_entries
+            self._lock = threading.Lock()
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)"
+            )
+            self.connection.commit()
+            logger.info(f"Embedding cache ready at {path}")
+        except Exception as e:
+            logger.error(f"Failed to open embedding cache: {str(e)}")
+            raise Exception(f"Failed to open embedding cache: {str(e)}")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self.connection.commit()
+
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, array("f", vector).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            self.connection.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_entries:
+            return
+
+        # Trim below the limit so eviction does not run on every insert
+        target = int(self.max_entries * 0.9)
+        self.connection.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (count - target,),
+        )
+        self.connection.commit()
+        logger.info(f"Evicted {count - target} entries from embedding cache")
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self, embeddings: Embeddings, cache: EmbeddingCache, namespace: str
+    ) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.query_cache = TTLCache(
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+        )
+
+    def _key(self, text: str) -> str:
+        return HashUtils.content_hash(f"{self.namespace}\n{text}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self.cache.get_many(list(set(keys)))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing[key] = text
+
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            Metrics.observe(
+                "ragify_embedding_batch_seconds", time.perf_counter() - start
+            )
+            new_items = dict(zip(missing.keys(), vectors))
+            self.cache.set_many(new_items)
+            cached.update(new_items)
+
+        batch_hits = len(texts) - len(missing)
+        with self._lock:
+            self.hits += batch_hits
+            self.misses += len(missing)
+        Metrics.inc("ragify_embedding_texts_total", batch_hits, cache="hit")
+        Metrics.inc("ragify_embedding_texts_total", len(missing), cache="miss")
+
+        logger.info(
+            f"Embedding cache: {batch_hits} hits, {len(missing)} misses "
+            f"(total {self.hits} hits, {self.misses} misses)"
+        )
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = TTLCache.normalize_query(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.set(key, vector)
+        else:
+            logger.info("Query embedding served from cache")
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = TTLCache.normalize_query(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.query_cache.set(key, vector)
+        else:
+            logger.info("Query embedding served from cache")
+        return vector
+
+    def _split_cached_queries(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        for text in texts:
+            key = TTLCache.normalize_query(text)
+            vector = self.query_cache.get(key)
+            if vector is not None:
+                vectors[key] = vector
+            else:
+                missing.setdefault(key, text)
+        return vectors, missing
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Several queries share one embeddings request instead of one each
+        vectors, missing = self._split_cached_queries(texts)
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            for key, vector in zip(missing, embedded):
+                self.query_cache.set(key, vector)
+                vectors[key] = vector
+        return [vectors[TTLCache.normalize_query(text)] for text in texts]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._split_cached_queries(texts)
+        if missing:
+            embedded = await self.embeddings.aembed_documents(list(missing.values()))
+            for key, vector in zip(missing, embedded):
+                self.query_cache.set(key, vector)
+                vectors[key] = vector
+        return [vectors[TTLCache.normalize_query(text)] for text in texts]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -1,46 +1,245 @@
 # app/database/mongodb.py
 
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Set
 
 from config import settings
-from database.qdrant import QdrantDatabase
-from pymongo import MongoClient
+from database.clients import ClientRegistry
+from pymongo import ASCENDING, DeleteMany, UpdateOne
 from utils.logger import logger
+from utils.metrics import Metrics
 
 
 class MongoDB:
     def __init__(self):
         try:
-            if settings.PYTHON_ENV.lower() == "prod":
-                logger.info("Connecting to MongoDB Cloud (PROD)")
-                self.client = MongoClient(settings.MONGODB_URI)
-            else:
-                logger.info("Connecting to MongoDB Local (DEV)")
-                self.client = MongoClient("mongodb://localhost:27017")
-
+            self.client = ClientRegistry.get_mongo_client()
             self.db = self.client.ragify_database
             self.links_collection = self.db.links
-            self.qdrant_db = QdrantDatabase()
+            self.tenants_collection = self.db.tenants
+            self._migrate_legacy_links()
+            self.links_collection.create_index(
+                [("tenant", ASCENDING), ("url", ASCENDING)], unique=True
+            )
+            self.links_collection.create_index(
+                [("tenant", ASCENDING), ("added_at", ASCENDING)]
+            )
+            self.links_collection.create_index(
+                [("status", ASCENDING), ("last_fetched_at", ASCENDING)]
+            )
+            self.tenants_collection.create_index("name", unique=True)
+            self.add_tenant(settings.DEFAULT_TENANT)
             logger.info("Successfully connected to MongoDB")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise Exception(f"Failed to connect to MongoDB: {str(e)}")
 
-    def get_all_links(self) -> List[str]:
+    @classmethod
+    def get_instance(cls) -> "MongoDB":
+        return ClientRegistry.get_or_create("mongodb", cls)
+
+    def _migrate_legacy_links(self) -> None:
+        # Older deployments kept every link in a single `all_links` document
+        legacy_doc = self.links_collection.find_one({"all_links": {"$exists": True}})
+        if legacy_doc:
+            # Those links were embedded when they were saved
+            self._upsert_links(
+                settings.DEFAULT_TENANT,
+                legacy_doc.get("all_links", []),
+                status="embedded",
+            )
+            self.links_collection.delete_one({"_id": legacy_doc["_id"]})
+            logger.info(
+                f"Migrated {len(legacy_doc.get('all_links', []))} links to per-link documents"
+            )
+
+        # Links saved before tenants existed belong to the default tenant, and
+        # the old url index would stop two tenants from saving the same link
+        result = self.links_collection.update_many(
+            {"tenant": {"$exists": False}},
+            {"$set": {"tenant": settings.DEFAULT_TENANT}},
+        )
+        if result.modified_count:
+            logger.info(
+                f"Assigned {result.modified_count} links to the {settings.DEFAULT_TENANT} tenant"
+            )
+        if "url_1" in self.links_collection.index_information():
+            self.links_collection.drop_index("url_1")
+
+    def _upsert_links(
+        self, tenant: str, links: List[str], status: str = "pending"
+    ) -> None:
+        if not links:
+            return
+
+        now = datetime.now(timezone.utc)
+        self.links_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"tenant": tenant, "url": link},
+                    {
+                        "$setOnInsert": {
+                            "tenant": tenant,
+                            "url": link,
+                            "added_at": now,
+                            "last_fetched_at": None,
+                            "content_hash": None,
+                            "etag": None,
+                            "last_modified": None,
+                            "chunk_count": 0,
+                            "status": status,
+                        }
+                    },
+                    upsert=True,
+                )
+                for link in links
+            ],
+            ordered=False,
+        )
+
+    def get_tenants(self) -> List[str]:
+        try:
+            return [
+                doc["name"]
+                for doc in self.tenants_collection.find({}, {"_id": 0, "name": 1}).sort(
+                    "name", ASCENDING
+                )
+            ]
+        except Exception as e:
+            logger.error(f"Error getting tenants: {e}")
+            return [settings.DEFAULT_TENANT]
+
+    def add_tenant(self, tenant: str) -> None:
+        self.tenants_collection.update_one(
+            {"name": tenant},
+            {
+                "$setOnInsert": {
+                    "name": tenant,
+                    "created_at": datetime.now(timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+
+    def delete_tenant(self, tenant: str) -> None:
+        try:
+            with Metrics.span("mongodb", "delete_tenant"):
+                self.links_collection.delete_many({"tenant": tenant})
+                self.tenants_collection.delete_one({"name": tenant})
+
+        except Exception as e:
+            logger.error(f"Error deleting tenant {tenant}: {e}")
+            raise Exception(f"Failed to delete tenant links: {str(e)}")
+
+    def get_all_links(self, tenant: str) -> List[str]:
         try:
-            doc = self.links_collection.find_one({}, {"_id": 0})
-            return doc.get("all_links", []) if doc else []
+            with Metrics.span("mongodb", "get_all_links"):
+                return [
+                    doc["url"]
+                    for doc in self.links_collection.find(
+                        {"tenant": tenant}, {"_id": 0, "url": 1}
+                    ).sort("added_at", ASCENDING)
+                ]
         except Exception as e:
             logger.error(f"Error getting links: {e}")
             return []
 
-    def sync_links(self, new_links: List[str]) -> None:
+    def get_existing_links(self, tenant: str, links: List[str]) -> Set[str]:
         try:
-            self.links_collection.replace_one(
-                {},
-                {"all_links": new_links},
-                upsert=True,
-            )
+            with Metrics.span("mongodb", "get_existing_links"):
+                return {
+                    doc["url"]
+                    for doc in self.links_collection.find(
+                        {"tenant": tenant, "url": {"$in": links}}, {"_id": 0, "url": 1}
+                    )
+                }
+        except Exception as e:
+            logger.error(f"Error getting existing links: {e}")
+            raise Exception(f"Failed to get existing links: {str(e)}")
+
+    def get_links_due_for_refresh(
+        self, fetched_before: datetime, limit: int
+    ) -> List[Dict[str, Any]]:
+        # Pending links belong to an ingestion job that has not reached them yet
+        try:
+            with Metrics.span("mongodb", "get_links_due_for_refresh"):
+                return list(
+                    self.links_collection.find(
+                        {
+                            "status": {"$in": ["embedded", "failed"]},
+                            "$or": [
+                                {"last_fetched_at": None},
+                                {"last_fetched_at": {"$lt": fetched_before}},
+                            ],
+                        },
+                        {
+                            "_id": 0,
+                            "tenant": 1,
+                            "url": 1,
+                            "etag": 1,
+                            "last_modified": 1,
+                            "content_hash": 1,
+                        },
+                    )
+                    .sort("last_fetched_at", ASCENDING)
+                    .limit(limit)
+                )
+        except Exception as e:
+            logger.error(f"Error getting links due for refresh: {e}")
+            return []
+
+    def sync_links(
+        self, tenant: str, added_links: List[str], removed_links: List[str]
+    ) -> None:
+        # Only the diff is written, so saves stay cheap however many links exist
+        try:
+            with Metrics.span("mongodb", "sync_links"):
+                self._upsert_links(tenant, added_links)
+                if removed_links:
+                    self.links_collection.bulk_write(
+                        [DeleteMany({"tenant": tenant, "url": {"$in": removed_links}})]
+                    )
+
+        except Exception as e:
+            logger.error(f"Error syncing links: {e}")
+            raise Exception(f"Failed to sync links: {str(e)}")
+
+    def update_link_stats(
+        self, tenant: str, links: List[str], link_stats: Dict[str, Dict[str, Any]]
+    ) -> None:
+        # Links missing from the stats could not be fetched
+        if not links:
+            return
+
+        try:
+            now = datetime.now(timezone.utc)
+            operations = []
+            for link in links:
+                stats = link_stats.get(link)
+                if stats is None:
+                    operations.append(
+                        UpdateOne(
+                            {"tenant": tenant, "url": link},
+                            {"$set": {"last_fetched_at": now, "status": "failed"}},
+                        )
+                    )
+                    continue
+
+                operations.append(
+                    UpdateOne(
+                        {"tenant": tenant, "url": link},
+                        {
+                            "$set": {
+                                **stats,
+                                "last_fetched_at": now,
+                                "status": "embedded",
+                            }
+                        },
+                    )
+                )
+            with Metrics.span("mongodb", "update_link_stats"):
+                self.links_collection.bulk_write(operations, ordered=False)
 
         except Exception as e:
-            logger.error(f"Error adding links: {e}")
+            logger.error(f"Error updating link stats: {e}")
+            raise Exception(f"Failed to update link stats: {str(e)}")
@@ -0,0 +1,484 @@
+# app/database/numpy_backend.py
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from config import settings
+from constants import (
+    INDEXED_METADATA_FIELDS,
+    MIGRATION_COMMAND,
+    SOURCE_COLLECTION_SUFFIX,
+    SOURCE_FIELDS,
+    SOURCE_SUMMARIES_MARKER,
+    TENANT_FIELD,
+)
+from langchain_core.documents import Document
+from utils.database_utils import DatabaseUtils
+from utils.logger import logger
+
+INITIAL_CAPACITY = 1024
+# Metadata keys that filters can use, stored as integer codes per row
+FILTER_FIELDS = [
+    field.split(".", 1)[1] for field in INDEXED_METADATA_FIELDS + [TENANT_FIELD]
+]
+
+Filters = Dict[str, Union[str, List[str]]]
+
+
+class NumpyVectorIndex:
+    # Vectors are normalized on write into a memory-mapped float32 matrix, so
+    # a cosine search is one matrix-vector product. Payloads and each point's
+    # row live in SQLite, and filter fields are kept as integer code arrays
+    # so filters become vectorized masks instead of payload scans.
+    def __init__(self, path: str, dimensions: int) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(path, "points.sqlite3"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS points "
+            "(id TEXT PRIMARY KEY, row INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+
+        if os.path.exists(self._vectors_path):
+            self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        else:
+            self._vectors = np.lib.format.open_memmap(
+                self._vectors_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=(INITIAL_CAPACITY, dimensions),
+            )
+        self.dimensions = self._vectors.shape[1]
+
+        capacity = len(self._vectors)
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._payloads: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._codes = {
+            field: np.full(capacity, -1, dtype=np.int32) for field in FILTER_FIELDS
+        }
+        self._code_maps: Dict[str, Dict[str, int]] = {
+            field: {} for field in FILTER_FIELDS
+        }
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+
+        for point_id, row, payload in self._conn.execute(
+            "SELECT id, row, payload FROM points"
+        ):
+            self._set_row(row, point_id, json.loads(payload))
+        self._free_rows = [
+            row for row in range(capacity - 1, -1, -1) if not self._valid[row]
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors.flush()
+            self._conn.close()
+
+    def _set_row(self, row: int, point_id: str, payload: Dict[str, Any]) -> None:
+        metadata = payload.get("metadata") or {}
+        self._ids[row] = point_id
+        self._payloads[row] = payload
+        self._valid[row] = True
+        self._rows[point_id] = row
+        self._size = max(self._size, row + 1)
+        for field in FILTER_FIELDS:
+            value = metadata.get(field)
+            code_map = self._code_maps[field]
+            self._codes[field][row] = (
+                -1 if value is None else code_map.setdefault(str(value), len(code_map))
+            )
+
+    def _clear_row(self, row: int) -> None:
+        self._rows.pop(self._ids[row], None)
+        self._ids[row] = None
+        self._payloads[row] = None
+        self._valid[row] = False
+        for field in FILTER_FIELDS:
+            self._codes[field][row] = -1
+        self._free_rows.append(row)
+
+    def _grow(self) -> None:
+        # Doubling keeps appends amortized; the old file is copied once
+        capacity = len(self._vectors)
+        grown_path = f"{self._vectors_path}.grow"
+        grown = np.lib.format.open_memmap(
+            grown_path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(capacity * 2, self.dimensions),
+        )
+        grown[:capacity] = self._vectors
+        grown.flush()
+        del grown
+        del self._vectors
+        os.replace(grown_path, self._vectors_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+
+        self._ids.extend([None] * capacity)
+        self._payloads.extend([None] * capacity)
+        self._valid = np.concatenate([self._valid, np.zeros(capacity, dtype=bool)])
+        for field in FILTER_FIELDS:
+            self._codes[field] = np.concatenate(
+                [self._codes[field], np.full(capacity, -1, dtype=np.int32)]
+            )
+        self._free_rows = list(range(capacity * 2 - 1, capacity - 1, -1)) + (
+            self._free_rows
+        )
+
+    def _allocate_row(self) -> int:
+        if not self._free_rows:
+            self._grow()
+        return self._free_rows.pop()
+
+    def _field_mask(self, field: str, values: Union[str, List[str]]) -> np.ndarray:
+        values = [values] if isinstance(values, str) else values
+        code_map = self._code_maps[field]
+        codes = [code_map[value] for value in values if value in code_map]
+        field_codes = self._codes[field][: self._size]
+        if not codes:
+            return np.zeros(self._size, dtype=bool)
+        if len(codes) == 1:
+            return field_codes == codes[0]
+        return np.isin(field_codes, codes)
+
+    def _mask(
+        self, filters: Optional[Filters], any_filters: Optional[Filters] = None
+    ) -> np.ndarray:
+        # Every field in filters must match, and at least one in any_filters
+        mask = self._valid[: self._size].copy()
+        for field, values in (filters or {}).items():
+            mask &= self._field_mask(field, values)
+        if any_filters:
+            any_mask = np.zeros(self._size, dtype=bool)
+            for field, values in any_filters.items():
+                any_mask |= self._field_mask(field, values)
+            mask &= any_mask
+        return mask
+
+    def upsert(
+        self,
+        point_ids: List[str],
+        vectors: List[List[float]],
+        payloads: List[Dict[str, Any]],
+    ) -> None:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            rows = []
+            for point_id in point_ids:
+                row = self._rows.get(point_id)
+                rows.append(self._allocate_row() if row is None else row)
+            self._vectors[rows] = matrix
+            self._vectors.flush()
+
+            for row, point_id, payload in zip(rows, point_ids, payloads):
+                self._set_row(row, point_id, payload)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (id, row, payload) VALUES (?, ?, ?)",
+                [
+                    (point_id, row, json.dumps(payload))
+                    for point_id, row, payload in zip(point_ids, rows, payloads)
+                ],
+            )
+            self._conn.commit()
+
+    def delete(self, point_ids: List[str]) -> None:
+        with self._lock:
+            for point_id in point_ids:
+                row = self._rows.get(point_id)
+                if row is not None:
+                    self._clear_row(row)
+            self._conn.executemany(
+                "DELETE FROM points WHERE id = ?",
+                [(point_id,) for point_id in point_ids],
+            )
+            self._conn.commit()
+
+    def get_point_ids(self, filters: Optional[Filters] = None) -> Set[str]:
+        with self._lock:
+            return {self._ids[row] for row in np.flatnonzero(self._mask(filters))}
+
+    def delete_where(self, filters: Filters) -> None:
+        with self._lock:
+            self.delete(list(self.get_point_ids(filters)))
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def get_centroids(
+        self, field: str, values: List[str], filters: Filters
+    ) -> Dict[str, Tuple[List[float], int]]:
+        with self._lock:
+            centroids = {}
+            for value in values:
+                rows = np.flatnonzero(self._mask({**filters, field: value}))
+                if len(rows):
+                    centroids[value] = (
+                        self._vectors[rows].mean(axis=0).tolist(),
+                        len(rows),
+                    )
+            return centroids
+
+    def get_payloads(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return [
+                (point_id, self._payloads[row]) for point_id, row in self._rows.items()
+            ]
+
+    def search(
+        self,
+        vector: List[float],
+        k: int,
+        filters: Optional[Filters] = None,
+        any_filters: Optional[Filters] = None,
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+
+        with self._lock:
+            candidates = np.flatnonzero(self._mask(filters, any_filters))
+            if not len(candidates):
+                return []
+
+            # A small tenant is cheaper to gather than to score the whole matrix
+            if len(candidates) < self._size // 4:
+                scores = self._vectors[candidates] @ query
+            else:
+                scores = (self._vectors[: self._size] @ query)[candidates]
+
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (
+                    self._ids[candidates[i]],
+                    float(scores[i]),
+                    self._payloads[candidates[i]],
+                )
+                for i in top
+            ]
+
+
+class NumpyBackend:
+    # Embedded, dense-only backend for small deployments and local development
+    def __init__(self, embeddings: Any, migrate: bool = False) -> None:
+        self.embeddings = embeddings
+        self.search_k = settings.SEARCH_TOP_K
+        self.index = NumpyVectorIndex(
+            settings.NUMPY_INDEX_PATH, settings.EMBEDDING_DIMENSIONS
+        )
+        if self.index.dimensions != settings.EMBEDDING_DIMENSIONS:
+            if not migrate:
+                raise ValueError(
+                    f"NumPy index holds {self.index.dimensions}d vectors but "
+                    f"EMBEDDING_DIMENSIONS is {settings.EMBEDDING_DIMENSIONS}; "
+                    f"run `{MIGRATION_COMMAND}` to re-embed it"
+                )
+            self._migrate_index()
+        self._open_source_index(migrate)
+        logger.info(
+            f"Opened NumPy vector index at {settings.NUMPY_INDEX_PATH} "
+            f"with {self.index.count()} chunks"
+        )
+
+    def _migrate_index(self) -> None:
+        # Like the Qdrant migration, the stored chunks are embedded again from
+        # their payloads into a new index that then replaces the old one
+        target_path = f"{settings.NUMPY_INDEX_PATH}.migrating"
+        logger.info(
+            f"Migrating NumPy vector index from {self.index.dimensions}d to "
+            f"{settings.EMBEDDING_DIMENSIONS}d"
+        )
+        shutil.rmtree(target_path, ignore_errors=True)
+        target = NumpyVectorIndex(target_path, settings.EMBEDDING_DIMENSIONS)
+
+        points = self.index.get_payloads()
+        for i in range(0, len(points), settings.EMBEDDING_BATCH_SIZE):
+            batch = points[i : i + settings.EMBEDDING_BATCH_SIZE]
+            target.upsert(
+                [point_id for point_id, _ in batch],
+                self.embeddings.embed_documents(
+                    [payload.get("page_content", "") for _, payload in batch]
+                ),
+                [payload for _, payload in batch],
+            )
+
+        self.index.close()
+        target.close()
+        shutil.rmtree(settings.NUMPY_INDEX_PATH)
+        os.replace(target_path, settings.NUMPY_INDEX_PATH)
+        self.index = NumpyVectorIndex(
+            settings.NUMPY_INDEX_PATH, settings.EMBEDDING_DIMENSIONS
+        )
+        logger.info(f"Migrated {len(points)} chunks to the new index")
+
+    def _open_source_index(self, migrate: bool) -> None:
+        # Centroids are derived from the chunk vectors, so a missing or outdated
+        # source index is rebuilt rather than migrated. Like in Qdrant, only the
+        # migration command rebuilds it for existing chunks, and a marker file
+        # records that the build finished.
+        source_path = f"{settings.NUMPY_INDEX_PATH}{SOURCE_COLLECTION_SUFFIX}"
+        self._source_marker_path = os.path.join(source_path, SOURCE_SUMMARIES_MARKER)
+        self.source_index = NumpyVectorIndex(source_path, settings.EMBEDDING_DIMENSIONS)
+        if self.source_index.dimensions != settings.EMBEDDING_DIMENSIONS:
+            self.source_index.close()
+            shutil.rmtree(source_path)
+            self.source_index = NumpyVectorIndex(
+                source_path, settings.EMBEDDING_DIMENSIONS
+            )
+        if os.path.exists(self._source_marker_path):
+            return
+
+        if not migrate and self.index.count():
+            if settings.HIERARCHICAL_SEARCH_ENABLED:
+                logger.warning(
+                    "NumPy index has no source summaries yet, searching without "
+                    f"the source stage. Run `{MIGRATION_COMMAND}` to build them."
+                )
+            return
+
+        sources: Dict[Tuple[str, str], Set[str]] = {}
+        for _, payload in self.index.get_payloads():
+            metadata = payload.get("metadata") or {}
+            for field_key in SOURCE_FIELDS:
+                if metadata.get(field_key):
+                    sources.setdefault((metadata["tenant_id"], field_key), set()).add(
+                        str(metadata[field_key])
+                    )
+                    break
+        for (tenant, field_key), values in sources.items():
+            self.update_source_summaries(tenant, field_key, sorted(values))
+        open(self._source_marker_path, "w").close()
+        logger.info(
+            f"Built summaries for {sum(len(v) for v in sources.values())} sources"
+        )
+
+    def search_sources(
+        self, tenant: str, dense_vector: List[float], limit: int
+    ) -> Dict[str, List[str]]:
+        sources: Dict[str, List[str]] = {}
+        for _, _, payload in self.source_index.search(
+            dense_vector, limit, {"tenant_id": tenant}
+        ):
+            metadata = payload["metadata"]
+            for field_key in SOURCE_FIELDS:
+                if metadata.get(field_key):
+                    sources.setdefault(field_key, []).append(metadata[field_key])
+                    break
+        return sources
+
+    async def asearch_sources(
+        self, tenant: str, dense_vector: List[float], limit: int
+    ) -> Dict[str, List[str]]:
+        return self.search_sources(tenant, dense_vector, limit)
+
+    def search(
+        self,
+        query: str,
+        tenant: str,
+        dense_vector: List[float],
+        k: int,
+        sources: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Any]:
+        return [
+            Document(
+                page_content=payload.get("page_content", ""),
+                metadata={
+                    **(payload.get("metadata") or {}),
+                    "_id": point_id,
+                    "score": round(score, 4),
+                },
+            )
+            for point_id, score, payload in self.index.search(
+                dense_vector, k, {"tenant_id": tenant}, sources
+            )
+        ]
+
+    async def asearch(
+        self,
+        query: str,
+        tenant: str,
+        dense_vector: List[float],
+        k: int,
+        sources: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Any]:
+        # In-process and sub-millisecond, so there is nothing to await
+        return self.search(query, tenant, dense_vector, k, sources)
+
+    def update_source_summaries(
+        self, tenant: str, field_key: str, sources: List[str]
+    ) -> None:
+        centroids = self.index.get_centroids(field_key, sources, {"tenant_id": tenant})
+        if centroids:
+            self.source_index.upsert(
+                [
+                    DatabaseUtils.get_source_id(tenant, field_key, source)
+                    for source in centroids
+                ],
+                [vector for vector, _ in centroids.values()],
+                [
+                    {
+                        "metadata": {
+                            "tenant_id": tenant,
+                            field_key: source,
+                            "chunk_count": chunk_count,
+                        }
+                    }
+                    for source, (_, chunk_count) in centroids.items()
+                ],
+            )
+
+        self.source_index.delete(
+            [
+                DatabaseUtils.get_source_id(tenant, field_key, source)
+                for source in sources
+                if source not in centroids
+            ]
+        )
+
+    def add_documents(self, chunks: List[Any], point_ids: List[str]) -> None:
+        self.index.upsert(
+            point_ids,
+            self.embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+            [
+                {"page_content": chunk.page_content, "metadata": chunk.metadata}
+                for chunk in chunks
+            ],
+        )
+
+    def delete_by_field(self, tenant: str, field_key: str, values: List[str]) -> None:
+        self.index.delete_where({"tenant_id": tenant, field_key: values})
+        self.source_index.delete_where({"tenant_id": tenant, field_key: values})
+
+    def delete_ids(self, point_ids: List[str]) -> None:
+        self.index.delete(point_ids)
+
+    def delete_tenant(self, tenant: str) -> None:
+        self.index.delete_where({"tenant_id": tenant})
+        self.source_index.delete_where({"tenant_id": tenant})
+
+    def get_point_ids(self, tenant: str, field_key: str, values: List[str]) -> Set[str]:
+        return self.index.get_point_ids({"tenant_id": tenant, field_key: values})
+
+    def count_sources(self, tenant: str) -> Optional[int]:
+        if not os.path.exists(self._source_marker_path):
+            return None
+        return len(self.source_index.get_point_ids({"tenant_id": tenant}))
+
+    def count(self) -> int:
+        return self.index.count()
@@ -1,187 +1,523 @@
 # app/database/qdrant.py
 
-from typing import Any, List
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from config import settings
-from constants import OPENAI_EMBEDDING_DIMENSION, OPENAI_EMBEDDING_MODEL
+from constants import OPENAI_EMBEDDING_MODEL, RRF_RANK_CONSTANT, VECTOR_BACKENDS
+from database.clients import ClientRegistry
+from database.embedding_cache import CachedEmbeddings, EmbeddingCache
+from database.numpy_backend import NumpyBackend
+from database.qdrant_backend import QdrantBackend
+from database.sparse_embeddings import BM25SparseEmbeddings
 from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import (
-    Distance,
-    FieldCondition,
-    Filter,
-    MatchValue,
-    PointIdsList,
-    VectorParams,
-)
+from utils.cache_utils import TTLCache
+from utils.chunking_utils import ChunkingUtils
 from utils.database_utils import DatabaseUtils
+from utils.hash_utils import HashUtils
 from utils.logger import logger
+from utils.metrics import Metrics
 
 
 class QdrantDatabase:
-    def __init__(self) -> None:
+    # Shared across instances so a sync from any page invalidates every reader
+    _collection_version = 0
+    _version_lock = threading.Lock()
+    _search_cache = TTLCache(
+        max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    )
+    _source_counts: Dict[str, int] = {}
+
+    def __init__(self, migrate: bool = False) -> None:
+        # Only the migration command passes migrate; the app refuses to open a
+        # store that needs re-embedding rather than doing it on a page load
         try:
-            if settings.PYTHON_ENV.lower() == "prod":
-                logger.info("Connecting to Qdrant Cloud (PROD)")
-                self.client = QdrantClient(
-                    url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY
-                )
-            else:
-                logger.info("Connecting to Qdrant Local (DEV)")
-                self.client = QdrantClient(url="http://localhost:6333")
-
-            self.client.get_collections()
-            logger.info("Successfully connected to Qdrant")
-
-            self.embeddings = OpenAIEmbeddings(
-                model=OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY
-            )
-
-            self._ensure_collection_exists()
-
-            self.vector_store = QdrantVectorStore(
-                client=self.client,
-                collection_name=settings.QDRANT_COLLECTION_NAME,
-                embedding=self.embeddings,
+            self.embeddings = ClientRegistry.get_or_create(
+                "embeddings", QdrantDatabase._create_embeddings
             )
+            self.backend = self._create_backend(migrate)
+            self.search_k = self.backend.search_k
         except Exception as e:
-            logger.error(f"Failed to connect to Qdrant: {str(e)}")
-            raise Exception(f"Failed to connect to Qdrant database: {str(e)}")
-
-    def _ensure_collection_exists(self) -> None:
-        collections = self.client.get_collections()
-        collection_exists = any(
-            collection.name == settings.QDRANT_COLLECTION_NAME
-            for collection in collections.collections
+            logger.error(
+                f"Failed to open the {settings.VECTOR_BACKEND} backend: {str(e)}"
+            )
+            raise Exception(f"Failed to open the vector database: {str(e)}")
+
+    @classmethod
+    def get_instance(cls) -> "QdrantDatabase":
+        return ClientRegistry.get_or_create("qdrant_database", cls)
+
+    @staticmethod
+    def _create_embeddings() -> CachedEmbeddings:
+        return CachedEmbeddings(
+            embeddings=OpenAIEmbeddings(
+                model=OPENAI_EMBEDDING_MODEL,
+                dimensions=settings.EMBEDDING_DIMENSIONS,
+                api_key=settings.OPENAI_API_KEY,
+            ),
+            cache=EmbeddingCache(
+                path=settings.EMBEDDING_CACHE_PATH,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            ),
+            namespace=f"{OPENAI_EMBEDDING_MODEL}:{settings.EMBEDDING_DIMENSIONS}",
         )
 
-        if not collection_exists:
-            logger.info(
-                f"Creating collection {settings.QDRANT_COLLECTION_NAME} in Qdrant",
+    def _create_backend(self, migrate: bool) -> Any:
+        # Both backends store the same payloads and answer the same calls, so
+        # everything above them is shared
+        if settings.VECTOR_BACKEND not in VECTOR_BACKENDS:
+            raise ValueError(
+                f"Unknown vector backend `{settings.VECTOR_BACKEND}`, "
+                f"expected one of {VECTOR_BACKENDS}"
             )
-            self.client.create_collection(
-                collection_name=settings.QDRANT_COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=OPENAI_EMBEDDING_DIMENSION, distance=Distance.COSINE
-                ),
+        if settings.VECTOR_BACKEND == "numpy":
+            return NumpyBackend(self.embeddings, migrate)
+        # Most chunks come out near the configured size, which stands in for
+        # the average document length of BM25's length normalization
+        sparse_embeddings = BM25SparseEmbeddings.for_chunk_size(
+            ChunkingUtils.get_average_chunk_size()
+        )
+        return QdrantBackend(self.embeddings, sparse_embeddings, migrate)
+
+    @classmethod
+    def _invalidate_search_cache(cls) -> None:
+        with cls._version_lock:
+            cls._collection_version += 1
+            cls._search_cache.clear()
+            cls._source_counts.clear()
+
+    def _get_search_cache_key(
+        self, query: str, tenant: str, k: int
+    ) -> Tuple[str, str, int, int]:
+        return (tenant, TTLCache.normalize_query(query), k, self._collection_version)
+
+    def _get_cached_results(
+        self, cache_key: Tuple[str, str, int, int]
+    ) -> Optional[List[Any]]:
+        cached_results = self._search_cache.get(cache_key)
+        if cached_results is None:
+            Metrics.inc("ragify_search_cache_requests_total", result="miss")
+            return None
+
+        Metrics.inc("ragify_search_cache_requests_total", result="hit")
+
+        logger.info(f"Serving cached search results for {cache_key[1]}")
+        return [doc.model_copy(deep=True) for doc in cached_results]
+
+    def _cache_results(
+        self, cache_key: Tuple[str, str, int, int], results: List[Any]
+    ) -> None:
+        self._search_cache.set(
+            cache_key, [doc.model_copy(deep=True) for doc in results]
+        )
+
+    def _use_source_stage(self, source_count: Optional[int]) -> bool:
+        # Small knowledge bases are searched flat; the first stage only pays
+        # off once a tenant has enough sources to narrow down
+        return (
+            source_count is not None
+            and source_count >= settings.HIERARCHICAL_MIN_SOURCES
+        )
+
+    def _get_source_count(self, tenant: str) -> Optional[int]:
+        if not settings.HIERARCHICAL_SEARCH_ENABLED:
+            return None
+        if tenant not in self._source_counts:
+            source_count = self.backend.count_sources(tenant)
+            if source_count is None:
+                # Summaries are still being built, so search flat for now
+                return None
+            self._source_counts[tenant] = source_count
+        return self._source_counts[tenant]
+
+    def _search_backend(
+        self, query: str, tenant: str, dense_vector: List[float], k: int
+    ) -> List[Any]:
+        # The closest source centroids are found first, and the chunk search is
+        # then limited to those sources
+        sources = None
+        if self._use_source_stage(self._get_source_count(tenant)):
+            with Metrics.span("qdrant", "source_search"):
+                sources = self.backend.search_sources(
+                    tenant, dense_vector, settings.HIERARCHICAL_SOURCE_LIMIT
+                )
+        with Metrics.span("qdrant", "vector_search"):
+            return self.backend.search(query, tenant, dense_vector, k, sources)
+
+    async def _asearch_backend(
+        self, query: str, tenant: str, dense_vector: List[float], k: int
+    ) -> List[Any]:
+        sources = None
+        source_count = await asyncio.to_thread(self._get_source_count, tenant)
+        if self._use_source_stage(source_count):
+            with Metrics.span("qdrant", "source_search"):
+                sources = await self.backend.asearch_sources(
+                    tenant, dense_vector, settings.HIERARCHICAL_SOURCE_LIMIT
+                )
+        with Metrics.span("qdrant", "vector_search"):
+            return await self.backend.asearch(query, tenant, dense_vector, k, sources)
+
+    def search(self, query: str, tenant: str, k: Optional[int] = None) -> List[Any]:
+        k = k or self.search_k
+        cache_key = self._get_search_cache_key(query, tenant, k)
+        cached_results = self._get_cached_results(cache_key)
+        if cached_results is not None:
+            return cached_results
+
+        logger.info(f"Searching {tenant} for {query}")
+        with Metrics.span("qdrant", "query_embedding"):
+            dense_vector = self.embeddings.embed_query(query)
+        results = self._search_backend(query, tenant, dense_vector, k)
+
+        self._cache_results(cache_key, results)
+        return results
+
+    async def asearch(
+        self, query: str, tenant: str, k: Optional[int] = None
+    ) -> List[Any]:
+        k = k or self.search_k
+        cache_key = self._get_search_cache_key(query, tenant, k)
+        cached_results = self._get_cached_results(cache_key)
+        if cached_results is not None:
+            return cached_results
+
+        logger.info(f"Searching {tenant} for {query}")
+        with Metrics.span("qdrant", "query_embedding"):
+            dense_vector = await self.embeddings.aembed_query(query)
+        results = await self._asearch_backend(query, tenant, dense_vector, k)
+
+        self._cache_results(cache_key, results)
+        return results
+
+    @staticmethod
+    def fuse_results(result_lists: List[List[Any]]) -> List[Any]:
+        # Reciprocal rank fusion: a chunk found by several queries rises, and
+        # each chunk appears once however many queries returned it
+        scores: Dict[Any, float] = {}
+        docs: Dict[Any, Any] = {}
+        for results in result_lists:
+            for rank, doc in enumerate(results):
+                chunk_id = doc.metadata.get("_id", doc.page_content)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (
+                    RRF_RANK_CONSTANT + rank + 1
+                )
+                docs.setdefault(chunk_id, doc)
+        return [docs[chunk_id] for chunk_id in sorted(docs, key=lambda i: -scores[i])]
+
+    def _split_cached_queries(
+        self, queries: List[str], tenant: str, k: int
+    ) -> Tuple[Dict[str, List[Any]], List[str]]:
+        cached: Dict[str, List[Any]] = {}
+        missing: List[str] = []
+        for query in queries:
+            results = self._get_cached_results(
+                self._get_search_cache_key(query, tenant, k)
             )
-        else:
-            logger.info(
-                f"Collection {settings.QDRANT_COLLECTION_NAME} already exists in Qdrant",
+            if results is not None:
+                cached[query] = results
+            elif query not in missing:
+                missing.append(query)
+        return cached, missing
+
+    def search_many(
+        self, queries: List[str], tenant: str, k: Optional[int] = None
+    ) -> Dict[str, List[Any]]:
+        # Queries missing from the search cache are embedded in one request and
+        # searched concurrently
+        k = k or self.search_k
+        results, missing = self._split_cached_queries(queries, tenant, k)
+        if missing:
+            logger.info(f"Searching {tenant} for {missing}")
+            with Metrics.span("qdrant", "query_embedding"):
+                dense_vectors = self.embeddings.embed_queries(missing)
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                searches = [
+                    executor.submit(self._search_backend, query, tenant, vector, k)
+                    for query, vector in zip(missing, dense_vectors)
+                ]
+                for query, search in zip(missing, searches):
+                    results[query] = search.result()
+                    self._cache_results(
+                        self._get_search_cache_key(query, tenant, k), results[query]
+                    )
+        return results
+
+    async def asearch_many(
+        self, queries: List[str], tenant: str, k: Optional[int] = None
+    ) -> Dict[str, List[Any]]:
+        k = k or self.search_k
+        results, missing = self._split_cached_queries(queries, tenant, k)
+        if missing:
+            logger.info(f"Searching {tenant} for {missing}")
+            with Metrics.span("qdrant", "query_embedding"):
+                dense_vectors = await self.embeddings.aembed_queries(missing)
+            searches = await asyncio.gather(
+                *(
+                    self._asearch_backend(query, tenant, vector, k)
+                    for query, vector in zip(missing, dense_vectors)
+                )
             )
+            for query, query_results in zip(missing, searches):
+                results[query] = query_results
+                self._cache_results(
+                    self._get_search_cache_key(query, tenant, k), query_results
+                )
+        return results
 
-    def search(self, query: str, k: int = 3) -> List[Any]:
-        logger.info(f"Searching for {query}")
-        results = self.vector_store.similarity_search_with_score(query, k=k)
-        processed_results = []
-
-        for doc, score in results:
-            doc.metadata["score"] = round(score, 4)
-            processed_results.append(doc)
+    def multi_search(
+        self, queries: List[str], tenant: str, k: Optional[int] = None
+    ) -> List[Any]:
+        results = self.search_many(queries, tenant, k)
+        return self.fuse_results([results[query] for query in queries])
 
-        return processed_results
+    async def amulti_search(
+        self, queries: List[str], tenant: str, k: Optional[int] = None
+    ) -> List[Any]:
+        results = await self.asearch_many(queries, tenant, k)
+        return self.fuse_results([results[query] for query in queries])
 
     def remove_embeddings_by_metadata_field(
-        self, field_key: str, values: List[str]
+        self, tenant: str, field_key: str, values: List[str]
     ) -> None:
         try:
-            logger.info(f"Removing embeddings where `{field_key}` matches {values}")
-            for value in values:
-                all_point_ids = []
-                offset = None
-
-                while True:
-                    scroll_results = self.client.scroll(
-                        collection_name=settings.QDRANT_COLLECTION_NAME,
-                        scroll_filter=Filter(
-                            must=[
-                                FieldCondition(
-                                    key=f"metadata.{field_key}",
-                                    match=MatchValue(value=value),
-                                )
-                            ]
-                        ),
-                        limit=100,
-                        offset=offset,
-                    )
-
-                    points = scroll_results[0]
-                    next_offset = scroll_results[1]
-
-                    for point in points:
-                        point_id = str(point.id)
-                        all_point_ids.append(point_id)
-
-                    if not next_offset:
-                        break
-
-                    offset = next_offset
-
-                for i in range(0, len(all_point_ids), 100):
-                    batch = all_point_ids[i : i + 100]
-                    logger.info(f"Deleting batch {i//100 + 1} with {len(batch)} points")
-                    self.client.delete(
-                        collection_name=settings.QDRANT_COLLECTION_NAME,
-                        points_selector=PointIdsList(points=batch),
-                    )
-
+            logger.info(
+                f"Removing embeddings in {tenant} where `{field_key}` matches {values}"
+            )
+            self.backend.delete_by_field(tenant, field_key, values)
+            self._invalidate_search_cache()
             logger.info(f"Finished removing embeddings for {len(values)} values")
 
         except Exception as e:
             logger.error(f"Failed to remove embeddings: {str(e)}")
             raise Exception(f"Failed to remove embeddings: {str(e)}")
 
-    def embed_documents(self, documents: List[Any]) -> None:
+    def delete_tenant(self, tenant: str) -> None:
         try:
-            if not documents:
+            logger.info(f"Removing all embeddings for tenant {tenant}")
+            self.backend.delete_tenant(tenant)
+            self._invalidate_search_cache()
+
+        except Exception as e:
+            logger.error(f"Failed to remove tenant embeddings: {str(e)}")
+            raise Exception(f"Failed to remove tenant embeddings: {str(e)}")
+
+    def _prepare_source(
+        self, tenant: str, field_key: str, source: str, incremental: bool
+    ) -> Set[str]:
+        if incremental:
+            return self.backend.get_point_ids(tenant, field_key, [source])
+
+        self.remove_embeddings_by_metadata_field(tenant, field_key, [source])
+        return set()
+
+    def _submit_batch(
+        self,
+        executor: ThreadPoolExecutor,
+        in_flight: Set[Future],
+        point_ids: List[str],
+        chunks: List[Any],
+    ) -> None:
+        # Backpressure: wait for a slot before handing out another batch
+        while len(in_flight) >= settings.EMBEDDING_MAX_CONCURRENT_BATCHES:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.remove(future)
+                future.result()
+
+        def upsert() -> None:
+            with Metrics.span("qdrant", "embed_and_upsert_batch"):
+                self.backend.add_documents(chunks, point_ids)
+
+        in_flight.add(executor.submit(upsert))
+
+    def embed_documents(
+        self,
+        documents: Iterable[Any],
+        tenant: str,
+        field_key: Optional[str] = None,
+        incremental: bool = True,
+    ) -> Dict[str, int]:
+        # Documents are chunked, embedded and upserted one batch at a time, so
+        # memory stays flat and batches that finished survive a later failure.
+        # With a field key, each source is diffed against what is stored so
+        # only changed chunks are upserted and only stale chunks are deleted.
+        stored_ids: Dict[str, Set[str]] = {}
+        produced_ids: Dict[str, Set[str]] = {}
+        batch_ids: List[str] = []
+        batch_chunks: List[Any] = []
+        total_chunks = 0
+        submitted_chunks = 0
+        stale_ids: Set[str] = set()
+        stats_before = self.embeddings.get_stats()
+
+        def iter_tenant_documents() -> Iterator[Any]:
+            for doc in documents:
+                doc.metadata["tenant_id"] = tenant
+                yield doc
+
+        try:
+            logger.info("Chunking and embedding documents...")
+            with (
+                Metrics.span("qdrant", "embed_documents"),
+                ThreadPoolExecutor(
+                    max_workers=settings.EMBEDDING_MAX_CONCURRENT_BATCHES
+                ) as executor,
+            ):
+                in_flight: Set[Future] = set()
+                for point_id, chunk in DatabaseUtils.iter_chunks(
+                    iter_tenant_documents()
+                ):
+                    total_chunks += 1
+                    if field_key:
+                        source = str(chunk.metadata[field_key])
+                        if source not in stored_ids:
+                            stored_ids[source] = self._prepare_source(
+                                tenant, field_key, source, incremental
+                            )
+                            produced_ids[source] = set()
+                        produced_ids[source].add(point_id)
+                        if point_id in stored_ids[source]:
+                            continue
+
+                    batch_ids.append(point_id)
+                    batch_chunks.append(chunk)
+                    if len(batch_chunks) >= settings.EMBEDDING_BATCH_SIZE:
+                        self._submit_batch(executor, in_flight, batch_ids, batch_chunks)
+                        submitted_chunks += len(batch_chunks)
+                        batch_ids, batch_chunks = [], []
+
+                if batch_chunks:
+                    self._submit_batch(executor, in_flight, batch_ids, batch_chunks)
+                    submitted_chunks += len(batch_chunks)
+
+                for future in in_flight:
+                    future.result()
+
+            if total_chunks == 0:
                 logger.warning("No documents provided for embedding.")
-                return
+                return {}
+
+            Metrics.inc(
+                "ragify_ingested_chunks_total", submitted_chunks, result="upserted"
+            )
+            Metrics.inc(
+                "ragify_ingested_chunks_total",
+                total_chunks - submitted_chunks,
+                result="unchanged",
+            )
+            stats_after = self.embeddings.get_stats()
+            logger.info(
+                f"Upserted {submitted_chunks}/{total_chunks} chunks to Qdrant "
+                f"(embedding cache hits: {stats_after['hits'] - stats_before['hits']}, "
+                f"misses: {stats_after['misses'] - stats_before['misses']})."
+            )
 
-            logger.info(f"Chunking and embedding {len(documents)} documents...")
-            chunked_docs = DatabaseUtils.chunk_documents(documents)
-            logger.info(f"Generated {len(chunked_docs)} chunks from input documents.")
+            for source, source_ids in stored_ids.items():
+                stale_ids.update(source_ids - produced_ids[source])
+
+            if stale_ids:
+                self.backend.delete_ids(list(stale_ids))
+                logger.info(f"Deleted {len(stale_ids)} stale chunks from Qdrant.")
+
+            # Sources whose chunks are all unchanged keep their summaries
+            changed_sources = [
+                source
+                for source, source_ids in produced_ids.items()
+                if source_ids != stored_ids[source]
+            ]
+            if changed_sources:
+                with Metrics.span("qdrant", "update_source_summaries"):
+                    self.backend.update_source_summaries(
+                        tenant, field_key, changed_sources
+                    )
 
-            self.vector_store.add_documents(chunked_docs)
-            logger.info("Successfully added chunks to Qdrant.")
+            return {
+                source: len(source_ids) for source, source_ids in produced_ids.items()
+            }
 
         except Exception as e:
             logger.error(f"Failed to embed documents: {str(e)}")
             raise Exception(f"Failed to embed documents: {str(e)}")
 
+        finally:
+            if submitted_chunks or stale_ids:
+                self._invalidate_search_cache()
+
     def sync_webpage_embeddings(
-        self, added_links: List[str], removed_links: List[str]
-    ) -> None:
+        self,
+        tenant: str,
+        added_links: List[str],
+        removed_links: List[str],
+        incremental: bool = True,
+    ) -> Dict[str, Dict[str, Any]]:
+        # Returns the content hash, chunk count and HTTP validators of every
+        # link that was fetched
+        link_stats: Dict[str, Dict[str, Any]] = {}
+
+        def iter_docs() -> Iterator[Any]:
+            for link, result in DatabaseUtils.iter_webpages(added_links):
+                if not result["docs"]:
+                    continue
+                link_stats[link] = {
+                    "content_hash": HashUtils.normalized_content_hash(
+                        "".join(doc.page_content for doc in result["docs"])
+                    ),
+                    "etag": result["etag"],
+                    "last_modified": result["last_modified"],
+                }
+                yield from result["docs"]
+
         try:
             if removed_links:
-                self.remove_embeddings_by_metadata_field("source_url", removed_links)
+                self.remove_embeddings_by_metadata_field(
+                    tenant, "source_url", removed_links
+                )
 
             if added_links:
                 logger.info(f"Processing {len(added_links)} new links")
-                for link in added_links:
-                    docs = DatabaseUtils.get_webpage_text(link)
-                    if docs:
-                        self.embed_documents(docs)
+                chunk_counts = self.embed_documents(
+                    iter_docs(),
+                    tenant,
+                    field_key="source_url",
+                    incremental=incremental,
+                )
+                for link, stats in link_stats.items():
+                    stats["chunk_count"] = chunk_counts.get(link, 0)
+
+            return link_stats
 
         except Exception as e:
             logger.error(f"Error syncing webpage embeddings: {str(e)}")
             raise Exception(f"Failed to sync webpage documents: {str(e)}")
 
     def sync_document_embeddings(
-        self, added_filenames: List[str], removed_filenames: List[str]
+        self,
+        tenant: str,
+        added_filenames: List[str],
+        removed_filenames: List[str],
+        incremental: bool = True,
     ) -> None:
         try:
             if removed_filenames:
                 self.remove_embeddings_by_metadata_field(
-                    "source_filename", removed_filenames
+                    tenant, "source_filename", removed_filenames
                 )
 
             if added_filenames:
                 logger.info(f"Processing {len(added_filenames)} new files")
-                for filename in added_filenames:
-                    docs = DatabaseUtils.get_document_text(filename)
-                    if docs:
-                        self.embed_documents(docs)
+                docs = (
+                    doc
+                    for _, file_docs in DatabaseUtils.iter_documents_text(
+                        tenant, added_filenames
+                    )
+                    for doc in file_docs
+                )
+                self.embed_documents(
+                    docs, tenant, field_key="source_filename", incremental=incremental
+                )
 
         except Exception as e:
             logger.error(f"Error syncing document embeddings: {str(e)}")
@@ -0,0 +1,887 @@
+# app/database/qdrant_backend.py
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from config import settings
+from constants import (
+    COLLECTION_PROFILES,
+    INDEXED_METADATA_FIELDS,
+    MIGRATION_ALIAS_SUFFIX,
+    MIGRATION_COMMAND,
+    SOURCE_COLLECTION_SUFFIX,
+    SOURCE_FIELDS,
+    SOURCE_SUMMARIES_ALIAS_SUFFIX,
+    SPARSE_MIGRATION_SUFFIX,
+    SPARSE_VECTOR_NAME,
+    TENANT_FIELD,
+    TENANT_MIGRATION_ALIAS_SUFFIX,
+)
+from database.clients import ClientRegistry
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    Disabled,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    Fusion,
+    FusionQuery,
+    HnswConfigDiff,
+    IsEmptyCondition,
+    KeywordIndexParams,
+    KeywordIndexType,
+    MatchAny,
+    MatchValue,
+    Modifier,
+    PayloadField,
+    PayloadSchemaType,
+    PayloadSelectorInclude,
+    PointIdsList,
+    PointStruct,
+    Prefetch,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+from utils.database_utils import DatabaseUtils
+from utils.logger import logger
+
+# Sources whose chunks are read back per request when refreshing centroids
+SOURCE_BATCH_SIZE = 100
+
+
+class QdrantBackend:
+    def __init__(
+        self, embeddings: Any, sparse_embeddings: Any, migrate: bool = False
+    ) -> None:
+        self.client = ClientRegistry.get_qdrant_client()
+        self.async_client = ClientRegistry.get_async_qdrant_client()
+        self.embeddings = embeddings
+        self.sparse_embeddings = sparse_embeddings
+        self.profile = QdrantBackend._get_profile()
+        self.search_params = QdrantBackend._get_search_params(self.profile)
+        self.search_k = settings.SEARCH_TOP_K
+        self._load_search_tuning()
+
+        self._ensure_collection_exists(migrate)
+        self.source_collection_name = (
+            f"{settings.QDRANT_COLLECTION_NAME}{SOURCE_COLLECTION_SUFFIX}"
+        )
+        self._ensure_source_collection_exists(migrate)
+
+        self.vector_store = QdrantVectorStore(
+            client=self.client,
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            embedding=self.embeddings,
+            sparse_embedding=self.sparse_embeddings,
+            sparse_vector_name=SPARSE_VECTOR_NAME,
+            retrieval_mode=(
+                RetrievalMode.HYBRID if self.hybrid_enabled else RetrievalMode.DENSE
+            ),
+        )
+        logger.info("Successfully connected to Qdrant")
+
+    @staticmethod
+    def _get_profile() -> Dict[str, Any]:
+        if settings.QDRANT_COLLECTION_PROFILE not in COLLECTION_PROFILES:
+            raise ValueError(
+                f"Unknown collection profile `{settings.QDRANT_COLLECTION_PROFILE}`, "
+                f"expected one of {list(COLLECTION_PROFILES)}"
+            )
+        return COLLECTION_PROFILES[settings.QDRANT_COLLECTION_PROFILE]
+
+    @staticmethod
+    def _get_search_params(profile: Dict[str, Any]) -> Optional[SearchParams]:
+        hnsw_ef = settings.QDRANT_HNSW_EF or profile["hnsw_ef"]
+        quantization = (
+            QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"])
+            if profile["quantization"]
+            else None
+        )
+        if hnsw_ef is None and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+    def _load_search_tuning(self) -> None:
+        # Written by benchmarks/tune_search.py for this profile and dimension
+        if not os.path.exists(settings.SEARCH_TUNING_PATH):
+            return
+
+        try:
+            with open(settings.SEARCH_TUNING_PATH) as tuning_file:
+                tuning = json.load(tuning_file)
+
+            if (
+                tuning["profile"] != settings.QDRANT_COLLECTION_PROFILE
+                or tuning["dimensions"] != settings.EMBEDDING_DIMENSIONS
+            ):
+                logger.warning(
+                    f"Ignoring search tuning for the {tuning['profile']} profile at "
+                    f"{tuning['dimensions']}d; re-run the tuner for the current settings"
+                )
+                return
+
+            # Only index settings are tuned; the number of results stays
+            # SEARCH_TOP_K, and unmeasured settings keep the profile's values
+            hnsw_ef = tuning.get("hnsw_ef")
+            quantization = tuning.get("quantization")
+            if hnsw_ef is not None or quantization is not None:
+                profile_params = self.search_params or SearchParams()
+                self.search_params = SearchParams(
+                    hnsw_ef=hnsw_ef if hnsw_ef is not None else profile_params.hnsw_ef,
+                    quantization=(
+                        QuantizationSearchParams(**quantization)
+                        if quantization
+                        else profile_params.quantization
+                    ),
+                )
+            logger.info(f"Loaded search tuning: {self.search_params}")
+        except Exception as e:
+            logger.error(f"Ignoring invalid search tuning file: {str(e)}")
+
+    def _get_quantization_config(self) -> Any:
+        if self.profile["quantization"] == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            )
+        if self.profile["quantization"] == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def _get_hnsw_config(self) -> HnswConfigDiff:
+        # Every search is filtered to one tenant, so per-tenant graphs built
+        # on the tenant index replace the global graph when tenant indexing is on
+        return HnswConfigDiff(
+            m=0 if settings.QDRANT_TENANT_INDEXING else self.profile["hnsw_m"],
+            payload_m=self.profile["hnsw_m"],
+            ef_construct=self.profile["hnsw_ef_construct"],
+        )
+
+    def _create_collection(self, collection_name: str) -> None:
+        logger.info(
+            f"Creating collection {collection_name} in Qdrant "
+            f"({settings.EMBEDDING_DIMENSIONS}d, "
+            f"{settings.QDRANT_COLLECTION_PROFILE} profile)",
+        )
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=settings.EMBEDDING_DIMENSIONS,
+                distance=Distance.COSINE,
+                on_disk=self.profile["on_disk"],
+            ),
+            sparse_vectors_config=(
+                {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+                if settings.HYBRID_SEARCH_ENABLED
+                else None
+            ),
+            hnsw_config=self._get_hnsw_config(),
+            quantization_config=self._get_quantization_config(),
+        )
+
+    def _resolve_collection_name(self) -> str:
+        # Migrated collections sit behind an alias named after the setting
+        aliases = {
+            alias.alias_name: alias.collection_name
+            for alias in self.client.get_aliases().aliases
+        }
+        if settings.QDRANT_COLLECTION_NAME in aliases:
+            return aliases[settings.QDRANT_COLLECTION_NAME]
+
+        migrating_alias = f"{settings.QDRANT_COLLECTION_NAME}{MIGRATION_ALIAS_SUFFIX}"
+        if migrating_alias in aliases and not self.client.collection_exists(
+            settings.QDRANT_COLLECTION_NAME
+        ):
+            # A migration stopped after deleting the old collection; finish
+            # moving the name over to the new one
+            self._move_alias(aliases[migrating_alias], migrating_alias)
+            return aliases[migrating_alias]
+        return settings.QDRANT_COLLECTION_NAME
+
+    def _move_alias(self, target_name: str, previous_alias: str) -> None:
+        # Both operations apply together, so the name never points nowhere
+        self.client.update_collection_aliases(
+            change_aliases_operations=[
+                DeleteAliasOperation(
+                    delete_alias=DeleteAlias(alias_name=previous_alias)
+                ),
+                CreateAliasOperation(
+                    create_alias=CreateAlias(
+                        collection_name=target_name,
+                        alias_name=settings.QDRANT_COLLECTION_NAME,
+                    )
+                ),
+            ]
+        )
+
+    def _apply_profile(self, collection_name: str, collection_info: Any) -> None:
+        # Index and storage settings can change in place; Qdrant rebuilds the
+        # affected segments in the background without re-embedding anything
+        config = collection_info.config
+        quantization_config = self._get_quantization_config()
+        quantization_changed = type(config.quantization_config) is not type(
+            quantization_config
+        )
+        on_disk_changed = bool(config.params.vectors.on_disk) != self.profile["on_disk"]
+        hnsw_config = self._get_hnsw_config()
+        hnsw_changed = (
+            config.hnsw_config.m != hnsw_config.m
+            or config.hnsw_config.payload_m != hnsw_config.payload_m
+            or config.hnsw_config.ef_construct != hnsw_config.ef_construct
+        )
+        if not (quantization_changed or on_disk_changed or hnsw_changed):
+            return
+
+        logger.info(
+            f"Updating collection {collection_name} to the "
+            f"{settings.QDRANT_COLLECTION_PROFILE} profile"
+        )
+        self.client.update_collection(
+            collection_name=collection_name,
+            vectors_config=(
+                {"": VectorParamsDiff(on_disk=self.profile["on_disk"])}
+                if on_disk_changed
+                else None
+            ),
+            hnsw_config=hnsw_config if hnsw_changed else None,
+            quantization_config=(
+                (quantization_config or Disabled.DISABLED)
+                if quantization_changed
+                else None
+            ),
+        )
+
+    @staticmethod
+    def _has_sparse_vectors(collection_info: Any) -> bool:
+        sparse_vectors = collection_info.config.params.sparse_vectors or {}
+        return settings.HYBRID_SEARCH_ENABLED and SPARSE_VECTOR_NAME in sparse_vectors
+
+    def _migrate_collection(
+        self, collection_name: str, reuse_dense_vectors: bool = False
+    ) -> str:
+        # A new dimension needs new vectors, so every stored chunk is embedded
+        # again into a fresh collection that then takes over the alias. The
+        # chunks come from the payloads, so no source has to be fetched again.
+        # Adding sparse vectors copies the dense ones and only computes BM25.
+        # Runs from the migration command, never on app startup.
+        target_name = (
+            f"{settings.QDRANT_COLLECTION_NAME}_{settings.EMBEDDING_DIMENSIONS}d"
+        )
+        if target_name == collection_name:
+            target_name = f"{target_name}{SPARSE_MIGRATION_SUFFIX}"
+        logger.info(f"Migrating collection {collection_name} to {target_name}")
+        if self.client.collection_exists(target_name):
+            # Left over from an interrupted migration; the embedding cache makes
+            # the chunks it already embedded cheap to redo
+            self.client.delete_collection(target_name)
+        self._create_collection(target_name)
+
+        target_store = QdrantVectorStore(
+            client=self.client,
+            collection_name=target_name,
+            embedding=self.embeddings,
+            sparse_embedding=self.sparse_embeddings,
+            sparse_vector_name=SPARSE_VECTOR_NAME,
+            retrieval_mode=(
+                RetrievalMode.HYBRID
+                if settings.HYBRID_SEARCH_ENABLED
+                else RetrievalMode.DENSE
+            ),
+        )
+
+        offset = None
+        migrated = 0
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=settings.EMBEDDING_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=reuse_dense_vectors,
+            )
+            if points and reuse_dense_vectors:
+                self._copy_with_sparse_vectors(target_name, points)
+                migrated += len(points)
+                logger.info(f"Migrated {migrated} chunks to {target_name}")
+            elif points:
+                target_store.add_texts(
+                    [point.payload.get("page_content", "") for point in points],
+                    metadatas=[point.payload.get("metadata") or {} for point in points],
+                    ids=[str(point.id) for point in points],
+                    batch_size=len(points),
+                )
+                migrated += len(points)
+                logger.info(f"Migrated {migrated} chunks to {target_name}")
+
+            if offset is None:
+                break
+
+        if collection_name == settings.QDRANT_COLLECTION_NAME:
+            # An alias cannot share its name with a collection, so the old one
+            # has to go first. The temporary alias keeps the new collection
+            # findable if the process stops before the name moves over.
+            migrating_alias = (
+                f"{settings.QDRANT_COLLECTION_NAME}{MIGRATION_ALIAS_SUFFIX}"
+            )
+            self.client.update_collection_aliases(
+                change_aliases_operations=[
+                    CreateAliasOperation(
+                        create_alias=CreateAlias(
+                            collection_name=target_name, alias_name=migrating_alias
+                        )
+                    )
+                ]
+            )
+            self.client.delete_collection(collection_name)
+            self._move_alias(target_name, migrating_alias)
+        else:
+            self._move_alias(target_name, settings.QDRANT_COLLECTION_NAME)
+            self.client.delete_collection(collection_name)
+
+        logger.info(
+            f"Migrated {migrated} chunks from {collection_name} to {target_name}"
+        )
+        return target_name
+
+    def _copy_with_sparse_vectors(self, target_name: str, points: List[Any]) -> None:
+        sparse_vectors = self.sparse_embeddings.embed_documents(
+            [point.payload.get("page_content", "") for point in points]
+        )
+        self.client.upsert(
+            collection_name=target_name,
+            points=[
+                PointStruct(
+                    id=point.id,
+                    vector={
+                        "": point.vector,
+                        SPARSE_VECTOR_NAME: SparseVector(
+                            indices=sparse_vector.indices, values=sparse_vector.values
+                        ),
+                    },
+                    payload=point.payload,
+                )
+                for point, sparse_vector in zip(points, sparse_vectors)
+            ],
+        )
+
+    def _ensure_collection_exists(self, migrate: bool) -> None:
+        collection_name = self._resolve_collection_name()
+
+        if not self.client.collection_exists(collection_name):
+            self._create_collection(collection_name)
+        else:
+            logger.info(
+                f"Collection {settings.QDRANT_COLLECTION_NAME} already exists in Qdrant",
+            )
+            collection_info = self.client.get_collection(collection_name)
+            dimensions = collection_info.config.params.vectors.size
+            if dimensions != settings.EMBEDDING_DIMENSIONS:
+                if not migrate:
+                    raise ValueError(
+                        f"Collection {collection_name} holds {dimensions}d vectors "
+                        f"but EMBEDDING_DIMENSIONS is {settings.EMBEDDING_DIMENSIONS}; "
+                        f"run `{MIGRATION_COMMAND}` to re-embed it"
+                    )
+                collection_name = self._migrate_collection(collection_name)
+            elif (
+                migrate
+                and settings.HYBRID_SEARCH_ENABLED
+                and not self._has_sparse_vectors(collection_info)
+            ):
+                collection_name = self._migrate_collection(
+                    collection_name, reuse_dense_vectors=True
+                )
+            else:
+                self._apply_profile(collection_name, collection_info)
+
+        collection_info = self.client.get_collection(collection_name)
+        self.hybrid_enabled = self._has_sparse_vectors(collection_info)
+        if settings.HYBRID_SEARCH_ENABLED and not self.hybrid_enabled:
+            logger.warning(
+                f"Collection {settings.QDRANT_COLLECTION_NAME} has no sparse vectors, "
+                "falling back to dense-only search. Run "
+                f"`{MIGRATION_COMMAND}` to add them and enable hybrid search."
+            )
+
+        self._ensure_payload_indexes(collection_name, collection_info)
+        self._assign_default_tenant(collection_name)
+
+    def _ensure_payload_indexes(
+        self, collection_name: str, collection_info: Any
+    ) -> None:
+        for field_name in INDEXED_METADATA_FIELDS:
+            if field_name in collection_info.payload_schema:
+                continue
+
+            logger.info(f"Creating keyword payload index on `{field_name}`")
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+
+        if TENANT_FIELD not in collection_info.payload_schema:
+            # is_tenant co-locates each tenant's points on disk so filtered
+            # searches and tenant deletes only touch that tenant's data
+            logger.info(f"Creating tenant payload index on `{TENANT_FIELD}`")
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=TENANT_FIELD,
+                field_schema=KeywordIndexParams(
+                    type=KeywordIndexType.KEYWORD, is_tenant=True
+                ),
+            )
+
+    def _assign_default_tenant(self, collection_name: str) -> None:
+        # Chunks stored before tenants existed belong to the default tenant.
+        # An alias on the collection records that this ran; it goes away with
+        # the collection, so a migrated collection is checked once more.
+        marker = f"{collection_name}{TENANT_MIGRATION_ALIAS_SUFFIX}"
+        if any(
+            alias.alias_name == marker for alias in self.client.get_aliases().aliases
+        ):
+            return
+
+        self.client.set_payload(
+            collection_name=collection_name,
+            payload={"tenant_id": settings.DEFAULT_TENANT},
+            key="metadata",
+            points=Filter(
+                must=[IsEmptyCondition(is_empty=PayloadField(key=TENANT_FIELD))]
+            ),
+        )
+        self.client.update_collection_aliases(
+            change_aliases_operations=[
+                CreateAliasOperation(
+                    create_alias=CreateAlias(
+                        collection_name=collection_name, alias_name=marker
+                    )
+                )
+            ]
+        )
+
+    def _ensure_source_collection_exists(self, migrate: bool) -> None:
+        # One centroid per source keeps this collection small, so it uses the
+        # default index and no quantization
+        if self.client.collection_exists(self.source_collection_name):
+            collection_info = self.client.get_collection(self.source_collection_name)
+            if (
+                collection_info.config.params.vectors.size
+                == settings.EMBEDDING_DIMENSIONS
+            ):
+                self._ensure_source_summaries(migrate)
+                return
+            self.client.delete_collection(self.source_collection_name)
+
+        logger.info(f"Creating collection {self.source_collection_name} in Qdrant")
+        self.client.create_collection(
+            collection_name=self.source_collection_name,
+            vectors_config=VectorParams(
+                size=settings.EMBEDDING_DIMENSIONS, distance=Distance.COSINE
+            ),
+        )
+        self.client.create_payload_index(
+            collection_name=self.source_collection_name,
+            field_name=TENANT_FIELD,
+            field_schema=KeywordIndexParams(
+                type=KeywordIndexType.KEYWORD, is_tenant=True
+            ),
+        )
+        for field_name in INDEXED_METADATA_FIELDS:
+            self.client.create_payload_index(
+                collection_name=self.source_collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+        self._ensure_source_summaries(migrate)
+
+    def _ensure_source_summaries(self, migrate: bool) -> None:
+        # Building summaries reads every stored vector, so on an existing
+        # collection only the migration command does it. Until an alias marks
+        # the build as finished, searches skip the source stage.
+        self.source_summaries_ready = self._source_summaries_built()
+        if self.source_summaries_ready:
+            return
+
+        has_chunks = self.client.count(
+            collection_name=settings.QDRANT_COLLECTION_NAME, exact=False
+        ).count
+        if migrate or not has_chunks:
+            self._rebuild_source_summaries()
+            self.client.update_collection_aliases(
+                change_aliases_operations=[
+                    CreateAliasOperation(
+                        create_alias=CreateAlias(
+                            collection_name=self.source_collection_name,
+                            alias_name=self._source_summaries_marker(),
+                        )
+                    )
+                ]
+            )
+            self.source_summaries_ready = True
+        elif settings.HIERARCHICAL_SEARCH_ENABLED:
+            logger.warning(
+                f"Collection {self.source_collection_name} has no source summaries "
+                f"yet, searching without the source stage. Run `{MIGRATION_COMMAND}` "
+                "to build them."
+            )
+
+    def _source_summaries_marker(self) -> str:
+        return f"{self.source_collection_name}{SOURCE_SUMMARIES_ALIAS_SUFFIX}"
+
+    def _source_summaries_built(self) -> bool:
+        # Like the tenant marker, the alias goes away with the collection
+        marker = self._source_summaries_marker()
+        return any(
+            alias.alias_name == marker for alias in self.client.get_aliases().aliases
+        )
+
+    def _rebuild_source_summaries(self) -> None:
+        # Chunks stored before the source level existed, or embedded at another
+        # dimension, get their centroids from the stored vectors
+        sources: Dict[Tuple[str, str], Set[str]] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                limit=1000,
+                offset=offset,
+                with_payload=PayloadSelectorInclude(
+                    include=[TENANT_FIELD, *INDEXED_METADATA_FIELDS]
+                ),
+                with_vectors=False,
+            )
+            for point in points:
+                metadata = point.payload.get("metadata") or {}
+                for field_key in SOURCE_FIELDS:
+                    if metadata.get(field_key):
+                        sources.setdefault(
+                            (metadata["tenant_id"], field_key), set()
+                        ).add(str(metadata[field_key]))
+                        break
+
+            if offset is None:
+                break
+
+        for (tenant, field_key), values in sources.items():
+            self.update_source_summaries(tenant, field_key, sorted(values))
+        if sources:
+            logger.info(
+                f"Built summaries for {sum(len(v) for v in sources.values())} sources"
+            )
+
+    def _get_source_centroids(
+        self, tenant: str, field_key: str, sources: List[str]
+    ) -> Dict[str, Tuple[List[float], int]]:
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                scroll_filter=self._tenant_filter(
+                    tenant,
+                    FieldCondition(
+                        key=f"metadata.{field_key}", match=MatchAny(any=sources)
+                    ),
+                ),
+                limit=1000,
+                offset=offset,
+                with_payload=PayloadSelectorInclude(include=[f"metadata.{field_key}"]),
+                with_vectors=True,
+            )
+            for point in points:
+                source = str(point.payload["metadata"][field_key])
+                vector = (
+                    point.vector[""] if isinstance(point.vector, dict) else point.vector
+                )
+                sums[source] = sums.get(source, 0) + np.asarray(
+                    vector, dtype=np.float32
+                )
+                counts[source] = counts.get(source, 0) + 1
+
+            if offset is None:
+                break
+
+        return {
+            source: ((total / counts[source]).tolist(), counts[source])
+            for source, total in sums.items()
+        }
+
+    @staticmethod
+    def _tenant_filter(tenant: str, *conditions: Any) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(key=TENANT_FIELD, match=MatchValue(value=tenant)),
+                *conditions,
+            ]
+        )
+
+    def _build_query(
+        self,
+        query: str,
+        tenant: str,
+        dense_vector: List[float],
+        k: int,
+        sources: Optional[Dict[str, List[str]]],
+    ) -> Dict[str, Any]:
+        conditions = []
+        if sources:
+            # A chunk qualifies when it belongs to any of the selected sources
+            conditions.append(
+                Filter(
+                    should=[
+                        FieldCondition(
+                            key=f"metadata.{field_key}", match=MatchAny(any=values)
+                        )
+                        for field_key, values in sources.items()
+                    ]
+                )
+            )
+        query_filter = self._tenant_filter(tenant, *conditions)
+        if not self.hybrid_enabled:
+            return {
+                "query": dense_vector,
+                "query_filter": query_filter,
+                "search_params": self.search_params,
+                "limit": k,
+                "with_payload": True,
+            }
+
+        # Both candidate lists are fetched and fused by RRF in a single request
+        prefetch_limit = max(k, settings.HYBRID_PREFETCH_LIMIT)
+        sparse_query = self.sparse_embeddings.embed_query(query)
+        return {
+            "prefetch": [
+                Prefetch(
+                    query=dense_vector,
+                    filter=query_filter,
+                    params=self.search_params,
+                    limit=prefetch_limit,
+                ),
+                Prefetch(
+                    query=SparseVector(
+                        indices=sparse_query.indices, values=sparse_query.values
+                    ),
+                    using=SPARSE_VECTOR_NAME,
+                    filter=query_filter,
+                    limit=prefetch_limit,
+                ),
+            ],
+            "query": FusionQuery(fusion=Fusion.RRF),
+            "limit": k,
+            "with_payload": True,
+        }
+
+    @staticmethod
+    def _documents_from_points(points: List[Any]) -> List[Any]:
+        processed_results = []
+        for point in points:
+            metadata = point.payload.get("metadata") or {}
+            metadata["_id"] = point.id
+            metadata["score"] = round(point.score, 4)
+            processed_results.append(
+                Document(
+                    page_content=point.payload.get("page_content", ""),
+                    metadata=metadata,
+                )
+            )
+        return processed_results
+
+    @staticmethod
+    def _group_sources(points: List[Any]) -> Dict[str, List[str]]:
+        sources: Dict[str, List[str]] = {}
+        for point in points:
+            metadata = point.payload.get("metadata") or {}
+            for field_key in SOURCE_FIELDS:
+                if metadata.get(field_key):
+                    sources.setdefault(field_key, []).append(metadata[field_key])
+                    break
+        return sources
+
+    def search_sources(
+        self, tenant: str, dense_vector: List[float], limit: int
+    ) -> Dict[str, List[str]]:
+        response = self.client.query_points(
+            collection_name=self.source_collection_name,
+            query=dense_vector,
+            query_filter=self._tenant_filter(tenant),
+            limit=limit,
+            with_payload=True,
+        )
+        return self._group_sources(response.points)
+
+    async def asearch_sources(
+        self, tenant: str, dense_vector: List[float], limit: int
+    ) -> Dict[str, List[str]]:
+        response = await self.async_client.query_points(
+            collection_name=self.source_collection_name,
+            query=dense_vector,
+            query_filter=self._tenant_filter(tenant),
+            limit=limit,
+            with_payload=True,
+        )
+        return self._group_sources(response.points)
+
+    def search(
+        self,
+        query: str,
+        tenant: str,
+        dense_vector: List[float],
+        k: int,
+        sources: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Any]:
+        response = self.client.query_points(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            **self._build_query(query, tenant, dense_vector, k, sources),
+        )
+        return self._documents_from_points(response.points)
+
+    async def asearch(
+        self,
+        query: str,
+        tenant: str,
+        dense_vector: List[float],
+        k: int,
+        sources: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Any]:
+        response = await self.async_client.query_points(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            **self._build_query(query, tenant, dense_vector, k, sources),
+        )
+        return self._documents_from_points(response.points)
+
+    def update_source_summaries(
+        self, tenant: str, field_key: str, sources: List[str]
+    ) -> None:
+        # Each centroid is recomputed from the stored chunks, so it matches
+        # them however the chunks were added or removed
+        for i in range(0, len(sources), SOURCE_BATCH_SIZE):
+            batch = sources[i : i + SOURCE_BATCH_SIZE]
+            centroids = self._get_source_centroids(tenant, field_key, batch)
+            if centroids:
+                self.client.upsert(
+                    collection_name=self.source_collection_name,
+                    points=[
+                        PointStruct(
+                            id=DatabaseUtils.get_source_id(tenant, field_key, source),
+                            vector=vector,
+                            payload={
+                                "metadata": {
+                                    "tenant_id": tenant,
+                                    field_key: source,
+                                    "chunk_count": chunk_count,
+                                }
+                            },
+                        )
+                        for source, (vector, chunk_count) in centroids.items()
+                    ],
+                )
+
+            empty_sources = [source for source in batch if source not in centroids]
+            if empty_sources:
+                self.client.delete(
+                    collection_name=self.source_collection_name,
+                    points_selector=PointIdsList(
+                        points=[
+                            DatabaseUtils.get_source_id(tenant, field_key, source)
+                            for source in empty_sources
+                        ]
+                    ),
+                )
+
+    def add_documents(self, chunks: List[Any], point_ids: List[str]) -> None:
+        self.vector_store.add_documents(chunks, ids=point_ids, batch_size=len(chunks))
+
+    def delete_by_field(self, tenant: str, field_key: str, values: List[str]) -> None:
+        # Summaries share the chunk payload layout, so one filter covers both
+        points_selector = FilterSelector(
+            filter=self._tenant_filter(
+                tenant,
+                FieldCondition(key=f"metadata.{field_key}", match=MatchAny(any=values)),
+            )
+        )
+        for collection_name in (
+            settings.QDRANT_COLLECTION_NAME,
+            self.source_collection_name,
+        ):
+            self.client.delete(
+                collection_name=collection_name, points_selector=points_selector
+            )
+
+    def delete_ids(self, point_ids: List[str]) -> None:
+        self.client.delete(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            points_selector=PointIdsList(points=point_ids),
+        )
+
+    def delete_tenant(self, tenant: str) -> None:
+        # One filtered delete; the tenant index keeps it to that tenant's segments
+        for collection_name in (
+            settings.QDRANT_COLLECTION_NAME,
+            self.source_collection_name,
+        ):
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=FilterSelector(filter=self._tenant_filter(tenant)),
+            )
+
+    def get_point_ids(self, tenant: str, field_key: str, values: List[str]) -> Set[str]:
+        point_ids: Set[str] = set()
+        offset = None
+
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                scroll_filter=self._tenant_filter(
+                    tenant,
+                    FieldCondition(
+                        key=f"metadata.{field_key}", match=MatchAny(any=values)
+                    ),
+                ),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            point_ids.update(str(point.id) for point in points)
+
+            if offset is None:
+                break
+
+        return point_ids
+
+    def count_sources(self, tenant: str) -> Optional[int]:
+        # The migration command may build the summaries while the app runs
+        if not self.source_summaries_ready:
+            self.source_summaries_ready = self._source_summaries_built()
+            if not self.source_summaries_ready:
+                return None
+        return self.client.count(
+            collection_name=self.source_collection_name,
+            count_filter=self._tenant_filter(tenant),
+            exact=True,
+        ).count
+
+    def count(self) -> int:
+        return self.client.count(
+            collection_name=settings.QDRANT_COLLECTION_NAME, exact=True
+        ).count
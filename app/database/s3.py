@@ -1,113 +1,277 @@
 # app/database/s3.py
 
-import boto3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from config import settings
+from constants import TENANT_KEY_PREFIX, TENANT_MIGRATION_MARKER_KEY
+from database.clients import ClientRegistry
 from utils.logger import logger
+from utils.metrics import Metrics
 
 
 class S3Storage:
     def __init__(self):
         try:
-            if settings.PYTHON_ENV.lower() == "prod":
-                logger.info("Connecting to AWS S3 (PROD)")
-                self.s3_client = boto3.client(
-                    "s3",
-                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                    region_name=settings.AWS_REGION,
-                )
-                self.bucket_name = settings.AWS_BUCKET_NAME
-            else:
-                logger.info("Connecting to MinIO Local (DEV)")
-                self.s3_client = boto3.client(
-                    "s3",
-                    endpoint_url="http://localhost:9000",
-                    aws_access_key_id="useradmin",
-                    aws_secret_access_key="userpass",
-                    region_name="us-east-2",
-                )
-                self.bucket_name = settings.AWS_BUCKET_NAME
-
+            self.s3_client = ClientRegistry.get_s3_client()
+            self.bucket_name = settings.AWS_BUCKET_NAME
+            # tenant -> (manifest, refreshed_at)
+            self._manifests = {}
+            self._manifest_lock = threading.Lock()
+            self.transfer_config = TransferConfig(
+                multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+                multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+                max_concurrency=settings.S3_MULTIPART_MAX_CONCURRENCY,
+            )
+            self._migrate_legacy_objects()
             logger.info("S3Storage initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing S3Storage: {e}")
             raise Exception(f"Error initializing S3Storage: {e}")
 
-    def get_stored_filenames(self):
+    @classmethod
+    def get_instance(cls) -> "S3Storage":
+        return ClientRegistry.get_or_create("s3_storage", cls)
+
+    @staticmethod
+    def _get_prefix(tenant):
+        return f"{TENANT_KEY_PREFIX}{tenant}/"
+
+    @staticmethod
+    def _get_key(tenant, file_name):
+        return f"{S3Storage._get_prefix(tenant)}{file_name}"
+
+    def _migrate_legacy_objects(self):
+        # Files uploaded before tenants existed sit at the bucket root and
+        # belong to the default tenant. The delimiter keeps this listing to
+        # the root, and the marker skips it once they have been moved.
         try:
-            response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
+            self.s3_client.head_object(
+                Bucket=self.bucket_name, Key=TENANT_MIGRATION_MARKER_KEY
+            )
+            return
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
 
-            files = []
-            if "Contents" in response:
-                for item in response["Contents"]:
-                    files.append(item["Key"])
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        legacy_keys = [
+            item["Key"]
+            for page in paginator.paginate(Bucket=self.bucket_name, Delimiter="/")
+            for item in page.get("Contents", [])
+        ]
+        for key in legacy_keys:
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                CopySource={"Bucket": self.bucket_name, "Key": key},
+                Key=self._get_key(settings.DEFAULT_TENANT, key),
+            )
+        for i in range(0, len(legacy_keys), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [{"Key": key} for key in legacy_keys[i : i + 1000]],
+                    "Quiet": True,
+                },
+            )
+        if legacy_keys:
+            logger.info(
+                f"Moved {len(legacy_keys)} files to the {settings.DEFAULT_TENANT} tenant"
+            )
+        self.s3_client.upload_fileobj(
+            BytesIO(), self.bucket_name, TENANT_MIGRATION_MARKER_KEY
+        )
 
-            return files
+    def list_objects(self, tenant):
+        try:
+            prefix = self._get_prefix(tenant)
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            objects = {}
+            with Metrics.span("s3", "list"):
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                    for item in page.get("Contents", []):
+                        objects[item["Key"][len(prefix) :]] = {
+                            "size": item["Size"],
+                            "etag": item["ETag"].strip('"'),
+                            "last_modified": item["LastModified"],
+                        }
+            return objects
 
         except ClientError as e:
             logger.error(f"Error listing files from S3: {e}")
             raise
 
-    def download_file(self, file_name):
+    def get_manifest(self, tenant, force_refresh=False):
+        with self._manifest_lock:
+            manifest, refreshed_at = self._manifests.get(tenant, (None, 0.0))
+            is_stale = (
+                time.monotonic() - refreshed_at > settings.S3_MANIFEST_TTL_SECONDS
+            )
+            if manifest is None or is_stale or force_refresh:
+                manifest = self.list_objects(tenant)
+                self._manifests[tenant] = (manifest, time.monotonic())
+                logger.info(
+                    f"Refreshed S3 manifest for {tenant} with {len(manifest)} files"
+                )
+            return dict(manifest)
+
+    def _update_manifest_entry(self, tenant, file_name):
+        # Keeps the cached manifest current between full listings
+        response = self.s3_client.head_object(
+            Bucket=self.bucket_name, Key=self._get_key(tenant, file_name)
+        )
+        with self._manifest_lock:
+            manifest, _ = self._manifests.get(tenant, (None, 0.0))
+            if manifest is not None:
+                manifest[file_name] = {
+                    "size": response["ContentLength"],
+                    "etag": response["ETag"].strip('"'),
+                    "last_modified": response["LastModified"],
+                }
+        return response["ContentLength"]
+
+    def _remove_manifest_entry(self, tenant, file_name):
+        with self._manifest_lock:
+            manifest, _ = self._manifests.get(tenant, (None, 0.0))
+            if manifest is not None:
+                manifest.pop(file_name, None)
+
+    def get_stored_filenames(self, tenant):
+        return sorted(self.get_manifest(tenant))
+
+    def get_download_url(self, tenant, file_name):
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_name)
-            return response["Body"].read(), response["ContentType"]
+            return self.s3_client.generate_presigned_url(
+                "get_object",
+                Params={
+                    "Bucket": self.bucket_name,
+                    "Key": self._get_key(tenant, file_name),
+                    "ResponseContentDisposition": f'attachment; filename="{file_name}"',
+                },
+                ExpiresIn=settings.S3_PRESIGNED_URL_EXPIRY_SECONDS,
+            )
         except ClientError as e:
-            logger.error(f"Error downloading file from S3: {e}")
+            logger.error(f"Error creating download URL for {file_name}: {e}")
             raise
 
-    def upload_file(self, file_obj, file_name, content_type):
+    def download_file(self, tenant, file_name, file_obj):
+        # Managed transfer streams ranged parts into file_obj, so the object is
+        # never held in memory; returns the stored content type
         try:
-            self.s3_client.upload_fileobj(
-                file_obj,
-                self.bucket_name,
-                file_name,
-                ExtraArgs={"ContentType": content_type},
+            key = self._get_key(tenant, file_name)
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            with Metrics.span("s3", "download"):
+                self.s3_client.download_fileobj(
+                    self.bucket_name, key, file_obj, Config=self.transfer_config
+                )
+            Metrics.inc(
+                "ragify_s3_bytes_total", response["ContentLength"], direction="download"
             )
+            return response["ContentType"]
+        except ClientError as e:
+            logger.error(f"Error downloading file from S3: {e}")
+            raise
 
-            url = f"https://{self.bucket_name}.s3.amazonaws.com/{file_name}"
+    def upload_file(self, tenant, file_obj, file_name, content_type):
+        try:
+            key = self._get_key(tenant, file_name)
+            with Metrics.span("s3", "upload"):
+                self.s3_client.upload_fileobj(
+                    file_obj,
+                    self.bucket_name,
+                    key,
+                    ExtraArgs={"ContentType": content_type},
+                    Config=self.transfer_config,
+                )
+
+            size = self._update_manifest_entry(tenant, file_name)
+            Metrics.inc("ragify_s3_bytes_total", size, direction="upload")
+
+            url = f"https://{self.bucket_name}.s3.amazonaws.com/{key}"
             return url
 
         except ClientError as e:
             logger.error(f"Error uploading file to S3: {e}")
             raise
 
-    def upload_files(self, files):
+    def upload_files(self, tenant, files):
         uploaded_files = []
-        for user_file in files:
-            try:
-                self.upload_file(
+        with ThreadPoolExecutor(
+            max_workers=settings.S3_TRANSFER_MAX_WORKERS
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self.upload_file,
+                    tenant,
                     user_file["file_obj"],
                     user_file["file_name"],
                     user_file["content_type"],
-                )
-                uploaded_files.append(user_file["file_name"])
-            except Exception as e:
-                logger.error(f"Error uploading file {user_file['file_name']}: {e}")
+                ): user_file["file_name"]
+                for user_file in files
+            }
+            for future in as_completed(futures):
+                file_name = futures[future]
+                try:
+                    future.result()
+                    uploaded_files.append(file_name)
+                except Exception as e:
+                    logger.error(f"Error uploading file {file_name}: {e}")
 
         if uploaded_files:
             logger.info(f"Files added: {', '.join(uploaded_files)}")
 
         return uploaded_files
 
-    def delete_file(self, file_name):
-        try:
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_name)
-        except ClientError as e:
-            logger.error(f"Error deleting file from S3: {e}")
-            raise
-
-    def delete_files(self, file_names):
+    def delete_files(self, tenant, file_names):
         deleted_files = []
-        for file_name in file_names:
+        # delete_objects accepts at most 1000 keys per request
+        for i in range(0, len(file_names), 1000):
+            batch = file_names[i : i + 1000]
             try:
-                self.delete_file(file_name)
-                deleted_files.append(file_name)
-            except Exception as e:
-                logger.error(f"Error deleting file {file_name}: {e}")
+                with Metrics.span("s3", "delete_batch"):
+                    response = self.s3_client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={
+                            "Objects": [
+                                {"Key": self._get_key(tenant, file_name)}
+                                for file_name in batch
+                            ],
+                            "Quiet": True,
+                        },
+                    )
+            except ClientError as e:
+                logger.error(f"Error deleting files from S3: {e}")
+                continue
+
+            failed_files = set()
+            prefix = self._get_prefix(tenant)
+            for error in response.get("Errors", []):
+                failed_files.add(error["Key"][len(prefix) :])
+                logger.error(f"Error deleting file {error['Key']}: {error['Message']}")
+
+            for file_name in batch:
+                if file_name not in failed_files:
+                    self._remove_manifest_entry(tenant, file_name)
+                    deleted_files.append(file_name)
 
         if deleted_files:
             logger.info(f"Documents removed: {', '.join(deleted_files)}")
 
         return deleted_files
+
+    def delete_tenant(self, tenant):
+        # S3 has no prefix delete, so the listing is removed in 1000-key batches
+        file_names = list(self.list_objects(tenant))
+        deleted_files = self.delete_files(tenant, file_names)
+        with self._manifest_lock:
+            self._manifests.pop(tenant, None)
+
+        if len(deleted_files) != len(file_names):
+            raise Exception(
+                f"Failed to delete {len(file_names) - len(deleted_files)} files "
+                f"for tenant {tenant}"
+            )
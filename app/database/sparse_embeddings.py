@@ -0,0 +1,59 @@
+# app/database/sparse_embeddings.py
+
+import hashlib
+import re
+from collections import Counter
+from typing import List
+
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+# Keeps identifiers such as `config.py` or `ERR-1042` whole alongside their parts
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*")
+# Roughly how many of these tokens an embedding token covers in English prose
+WORDS_PER_EMBEDDING_TOKEN = 0.75
+
+
+class BM25SparseEmbeddings(SparseEmbeddings):
+    def __init__(self, avg_doc_length: float, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    @classmethod
+    def for_chunk_size(cls, chunk_size: float) -> "BM25SparseEmbeddings":
+        # Chunk sizes are in embedding tokens, while BM25 counts the words below
+        return cls(avg_doc_length=chunk_size * WORDS_PER_EMBEDDING_TOKEN)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        tokens = []
+        for match in TOKEN_PATTERN.findall(text.lower()):
+            tokens.append(match)
+            if "." in match or "-" in match:
+                tokens.extend(re.split(r"[.\-]", match))
+        return tokens
+
+    @staticmethod
+    def token_index(token: str) -> int:
+        # Python's hash() is salted per process, so use a stable digest instead
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+        return int.from_bytes(digest, "little") & 0x7FFFFFFF
+
+    def _term_weights(self, tokens: List[str]) -> SparseVector:
+        # Qdrant applies the IDF part of BM25 server-side via Modifier.IDF
+        doc_length = len(tokens)
+        weights = {}
+        for token, tf in Counter(tokens).items():
+            index = self.token_index(token)
+            norm = 1 - self.b + self.b * doc_length / self.avg_doc_length
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (
+                tf + self.k1 * norm
+            )
+        return SparseVector(indices=list(weights), values=list(weights.values()))
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return [self._term_weights(self.tokenize(text)) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        indices = {self.token_index(token) for token in self.tokenize(text)}
+        return SparseVector(indices=list(indices), values=[1.0] * len(indices))
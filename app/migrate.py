@@ -0,0 +1,26 @@
+# app/migrate.py
+
+import argparse
+
+from config import settings
+from database.qdrant import QdrantDatabase
+from utils.logger import logger
+
+
+def main() -> None:
+    argparse.ArgumentParser(
+        description=(
+            "Bring the vector store in line with the current settings. Re-embeds "
+            "the stored chunks after EMBEDDING_DIMENSIONS changes, adds sparse "
+            "vectors to collections created before hybrid search and builds "
+            "missing source summaries."
+        )
+    ).parse_args()
+
+    logger.info(f"Migrating the {settings.VECTOR_BACKEND} vector store")
+    QdrantDatabase(migrate=True)
+    logger.info("Vector store is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 # app/pages/Manage_Files.py
 
-from database.qdrant import QdrantDatabase
+from config import settings
+from constants import JOB_KIND_DOCUMENTS
 from database.s3 import S3Storage
 from external.streamlit import st
+from services.ingestion_service import IngestionService
 from utils.logger import logger
+from utils.metrics import Metrics
+from utils.tenant_utils import TenantUtils
 
 if "uploader_key" not in st.session_state:
     st.session_state.uploader_key = 0
@@ -14,22 +18,15 @@ if "pending_deletions" not in st.session_state:
 if "documents" not in st.session_state:
     st.session_state.documents = []
 
+s3 = S3Storage.get_instance()
+ingestion_service = IngestionService.get_instance()
+Metrics.start_server()
+tenant = TenantUtils.select_tenant()
 
-@st.cache_resource
-def get_s3() -> S3Storage:
-    return S3Storage()
-
-
-@st.cache_resource
-def get_qdrant() -> QdrantDatabase:
-    return QdrantDatabase()
-
-
-s3 = get_s3()
-qdrant_db = get_qdrant()
-
-if not st.session_state.documents:
-    st.session_state.documents = s3.get_stored_filenames()
+if not st.session_state.documents or st.session_state.get("documents_tenant") != tenant:
+    st.session_state.documents = s3.get_stored_filenames(tenant)
+    st.session_state.pending_deletions = []
+    st.session_state.documents_tenant = tenant
 
 st.title("📝 Manage Files")
 st.markdown(
@@ -65,38 +62,51 @@ if uploaded_files:
 st.session_state.pending_documents = pending_docs
 
 if st.button("Save Changes", type="primary"):
-    uploaded_filenames, deleted_filenames = [], []
-
-    for doc in st.session_state.pending_documents:
-        try:
-            s3.upload_files([doc])
-            uploaded_filenames.append(doc["file_name"])
-        except Exception as e:
-            st.error(f"Error uploading {doc['file_name']}: {e}")
+    pending_filenames = [doc["file_name"] for doc in st.session_state.pending_documents]
+    uploaded_filenames = s3.upload_files(tenant, st.session_state.pending_documents)
+    for filename in pending_filenames:
+        if filename not in uploaded_filenames:
+            st.error(f"Error uploading {filename}")
     st.session_state.pending_documents = []
 
+    deleted_filenames = s3.delete_files(tenant, st.session_state.pending_deletions)
     for filename in st.session_state.pending_deletions:
-        try:
-            s3.delete_files([filename])
-            deleted_filenames.append(filename)
-        except Exception as e:
-            st.error(f"Error deleting {filename}: {e}")
+        if filename not in deleted_filenames:
+            st.error(f"Error deleting {filename}")
     st.session_state.pending_deletions = []
 
-    st.session_state.documents = s3.get_stored_filenames()
+    st.session_state.documents = s3.get_stored_filenames(tenant)
 
     logger.info(f"Uploaded files: {uploaded_filenames}")
     logger.info(f"Deleted files: {deleted_filenames}")
 
     try:
-        with st.spinner("Processing documents and creating embeddings..."):
-            qdrant_db.sync_document_embeddings(uploaded_filenames, deleted_filenames)
+        if uploaded_filenames or deleted_filenames:
+            ingestion_service.submit_job(
+                tenant, JOB_KIND_DOCUMENTS, uploaded_filenames, deleted_filenames
+            )
     except Exception as e:
         st.error(f"Error syncing document embeddings: {e}")
 
     st.session_state.uploader_key += 1
     st.rerun()
 
+
+@st.fragment(run_every=settings.INGESTION_PROGRESS_POLL_SECONDS)
+def show_ingestion_progress():
+    # Embedding runs in the background, so this only polls the persisted job state
+    for job in ingestion_service.get_recent_jobs(tenant, JOB_KIND_DOCUMENTS):
+        if job["status"] in ("pending", "running"):
+            st.progress(
+                job["completed"] / max(job["total"], 1),
+                text=f"Processing documents and creating embeddings... ({job['completed']}/{job['total']})",
+            )
+        elif job["status"] == "failed":
+            st.error(f"Error syncing document embeddings: {job['error']}")
+
+
+show_ingestion_progress()
+
 if st.session_state.pending_documents or st.session_state.pending_deletions:
     st.warning("You have unsaved changes. Click 'Save Changes' to persist them.")
 
@@ -112,14 +122,8 @@ if st.session_state.documents:
         with col2:
             dl_col, del_col = st.columns(2)
             with dl_col:
-                file_content, content_type = s3.download_file(filename)
-                st.download_button(
-                    label="Save",
-                    data=file_content,
-                    file_name=filename,
-                    mime=content_type,
-                    key=f"save_{idx}",
-                )
+                # The browser fetches the file from S3 only when Save is clicked
+                st.link_button(label="Save", url=s3.get_download_url(tenant, filename))
             with del_col:
                 if st.button("Delete", key=f"delete_{idx}", type="primary"):
                     if filename not in st.session_state.pending_deletions:
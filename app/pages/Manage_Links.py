@@ -1,24 +1,21 @@
 # app/pages/Manage_Links.py
 
 import streamlit as st
+from config import settings
+from constants import JOB_KIND_LINKS
 from database.mongodb import MongoDB
-from database.qdrant import QdrantDatabase
+from services.ingestion_service import IngestionService
+from services.refresh_service import RefreshService
 from utils.logger import logger
+from utils.metrics import Metrics
+from utils.tenant_utils import TenantUtils
 from utils.validation_utils import ValidationUtils
 
-
-@st.cache_resource
-def get_mongodb():
-    return MongoDB()
-
-
-@st.cache_resource
-def get_qdrant():
-    return QdrantDatabase()
-
-
-db = get_mongodb()
-qdrant_db = get_qdrant()
+db = MongoDB.get_instance()
+ingestion_service = IngestionService.get_instance()
+RefreshService.get_instance()
+Metrics.start_server()
+tenant = TenantUtils.select_tenant()
 
 if "links" not in st.session_state:
     st.session_state.links = []
@@ -35,9 +32,13 @@ st.markdown(
 )
 
 
-if not st.session_state.pending_links and not st.session_state.links:
-    st.session_state.links = db.get_all_links()
+if (
+    not st.session_state.pending_links and not st.session_state.links
+) or st.session_state.get("links_tenant") != tenant:
+    st.session_state.links = db.get_all_links(tenant)
     st.session_state.pending_links = st.session_state.links.copy()
+    st.session_state.pending_deletions = []
+    st.session_state.links_tenant = tenant
 
 
 with st.form("add_link_form"):
@@ -62,31 +63,47 @@ with st.form("add_link_form"):
 
 if st.button("Save Changes", type="primary"):
     try:
-        db.sync_links(st.session_state.pending_links)
+        saved_links = set(st.session_state.links)
+        pending_links = set(st.session_state.pending_links)
         new_links = [
-            link
-            for link in st.session_state.pending_links
-            if link not in st.session_state.links
+            link for link in st.session_state.pending_links if link not in saved_links
         ]
         removed_links = [
-            link
-            for link in st.session_state.links
-            if link not in st.session_state.pending_links
+            link for link in st.session_state.links if link not in pending_links
         ]
+        db.sync_links(tenant, new_links, removed_links)
 
         logger.info(f"New links: {new_links}")
         logger.info(f"Removed links: {removed_links}")
 
-        with st.spinner("Processing links and creating embeddings..."):
-            qdrant_db.sync_webpage_embeddings(new_links, removed_links)
+        if new_links or removed_links:
+            ingestion_service.submit_job(
+                tenant, JOB_KIND_LINKS, new_links, removed_links
+            )
 
-        st.session_state.links = db.get_all_links()
+        st.session_state.links = db.get_all_links(tenant)
         st.session_state.pending_links = st.session_state.links.copy()
         st.session_state.pending_deletions = []
         st.rerun()
     except Exception as e:
         st.error(f"Error saving changes: {str(e)}")
 
+
+@st.fragment(run_every=settings.INGESTION_PROGRESS_POLL_SECONDS)
+def show_ingestion_progress():
+    # Embedding runs in the background, so this only polls the persisted job state
+    for job in ingestion_service.get_recent_jobs(tenant, JOB_KIND_LINKS):
+        if job["status"] in ("pending", "running"):
+            st.progress(
+                job["completed"] / max(job["total"], 1),
+                text=f"Processing links and creating embeddings... ({job['completed']}/{job['total']})",
+            )
+        elif job["status"] == "failed":
+            st.error(f"Error syncing webpage embeddings: {job['error']}")
+
+
+show_ingestion_progress()
+
 if (
     st.session_state.pending_links != st.session_state.links
     or st.session_state.pending_deletions
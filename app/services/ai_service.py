@@ -1,41 +1,278 @@
-from typing import Dict, Generator, List
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Dict, Generator, List
 
 from config import settings
+from database.clients import ClientRegistry
 from database.qdrant import QdrantDatabase
 from langchain.callbacks.tracers.langchain import LangChainTracer
 from langchain_openai import ChatOpenAI
 from utils.ai_utils import AIUtils
+from utils.cache_utils import TTLCache
 from utils.logger import logger
+from utils.metrics import Metrics
 
 
 class AIService:
     def __init__(self):
-        self.tracer = LangChainTracer()
-        self.qdrant_db = QdrantDatabase()
+        # Stage metrics are recorded either way; LangSmith is optional
+        self.tracer = (
+            LangChainTracer() if settings.LANGSMITH_TRACING.lower() == "true" else None
+        )
+        self.qdrant_db = QdrantDatabase.get_instance()
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0,
             api_key=settings.OPENAI_API_KEY,
-            callbacks=[self.tracer],
+            callbacks=[self.tracer] if self.tracer else None,
         )
+        # Retrieval waits on the rewrite, so it gets no retries and a short leash
+        self.rewrite_llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0,
+            max_tokens=200,
+            timeout=settings.QUERY_REWRITE_TIMEOUT_SECONDS,
+            max_retries=0,
+            api_key=settings.OPENAI_API_KEY,
+            callbacks=[self.tracer] if self.tracer else None,
+        )
+        self.executor = ThreadPoolExecutor(thread_name_prefix="retrieval")
 
-    def generate_response(
+    @classmethod
+    def get_instance(cls) -> "AIService":
+        return ClientRegistry.get_or_create("ai_service", cls)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _record_stream(start: float, first_token_at: float, token_count: int) -> None:
+        # Streamed chunks from the chat model carry one token each
+        end = time.perf_counter()
+        Metrics.observe(
+            "ragify_llm_time_to_first_token_seconds", first_token_at - start
+        )
+        Metrics.observe(
+            "ragify_stage_duration_seconds",
+            end - first_token_at,
+            component="ai_service",
+            stage="generation",
+        )
+        Metrics.inc("ragify_llm_output_tokens_total", token_count)
+        if token_count > 1 and end > first_token_at:
+            Metrics.observe(
+                "ragify_llm_tokens_per_second",
+                (token_count - 1) / (end - first_token_at),
+            )
+
+    @staticmethod
+    def _should_rewrite(chat_history: List[Dict[str, str]]) -> bool:
+        # A first question is already standalone, so it only goes through the
+        # rewrite when sub-queries were asked for
+        return settings.QUERY_REWRITE_ENABLED and bool(
+            chat_history or settings.QUERY_EXPANSION_COUNT
+        )
+
+    @staticmethod
+    def _get_rewrite_inputs(
+        user_prompt: str, chat_history: List[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        count = settings.QUERY_EXPANSION_COUNT
+        return {
+            "chat_history": AIUtils.trim_chat_history(
+                chat_history, settings.QUERY_REWRITE_HISTORY_TOKENS
+            ),
+            "user_prompt": user_prompt,
+            "expansion_instructions": (
+                f"Then add up to {count} different search queries that cover "
+                "other aspects of the question."
+                if count
+                else ""
+            ),
+        }
+
+    @staticmethod
+    def _parse_rewrite(user_prompt: str, response: Any) -> List[str]:
+        # An empty answer or the prompt echoed back adds nothing to the search
+        # of the prompt that is already running
+        queries = AIUtils.parse_queries(
+            str(response.content), 1 + settings.QUERY_EXPANSION_COUNT
+        )
+        normalized = [TTLCache.normalize_query(query) for query in queries]
+        if normalized in ([], [TTLCache.normalize_query(user_prompt)]):
+            return []
+
+        logger.info(f"Rewrote {user_prompt} as {queries}")
+        return queries
+
+    def _rewrite_queries(
         self, user_prompt: str, chat_history: List[Dict[str, str]]
+    ) -> List[str]:
+        with Metrics.span("ai_service", "query_rewrite"):
+            chain = AIUtils.fetch_query_rewrite_prompt() | self.rewrite_llm
+            response = chain.invoke(self._get_rewrite_inputs(user_prompt, chat_history))
+        return self._parse_rewrite(user_prompt, response)
+
+    async def _arewrite_queries(
+        self, user_prompt: str, chat_history: List[Dict[str, str]]
+    ) -> List[str]:
+        with Metrics.span("ai_service", "query_rewrite"):
+            chain = AIUtils.fetch_query_rewrite_prompt() | self.rewrite_llm
+            response = await chain.ainvoke(
+                self._get_rewrite_inputs(user_prompt, chat_history)
+            )
+        return self._parse_rewrite(user_prompt, response)
+
+    def _search_rewrites(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
+    ) -> Dict[str, List[Any]]:
+        queries = self._rewrite_queries(user_prompt, chat_history)
+        return self.qdrant_db.search_many(
+            [query for query in queries if query != user_prompt], tenant
+        )
+
+    async def _asearch_rewrites(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
+    ) -> Dict[str, List[Any]]:
+        queries = await self._arewrite_queries(user_prompt, chat_history)
+        return await self.qdrant_db.asearch_many(
+            [query for query in queries if query != user_prompt], tenant
+        )
+
+    def _fuse_rewrite_results(
+        self, prompt_results: List[Any], rewrite_search: Any
+    ) -> List[Any]:
+        # The answer never waits on the rewrite: its hits are fused in only
+        # when they are ready by the time the prompt's own search finishes
+        if not rewrite_search.done():
+            rewrite_search.cancel()
+            Metrics.inc("ragify_query_rewrites_total", result="late")
+            return prompt_results
+
+        try:
+            rewrite_results = rewrite_search.result()
+        except Exception as e:
+            Metrics.inc("ragify_query_rewrites_total", result="failed")
+            logger.warning(f"Query rewrite failed: {str(e)}")
+            return prompt_results
+
+        if not rewrite_results:
+            Metrics.inc("ragify_query_rewrites_total", result="unchanged")
+            return prompt_results
+        Metrics.inc("ragify_query_rewrites_total", result="used")
+        return QdrantDatabase.fuse_results([prompt_results, *rewrite_results.values()])
+
+    def _retrieve(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
+    ) -> List[Any]:
+        if not self._should_rewrite(chat_history):
+            return self.qdrant_db.search(user_prompt, tenant)
+
+        rewrite_search = self.executor.submit(
+            self._search_rewrites, user_prompt, tenant, chat_history
+        )
+        prompt_results = self.qdrant_db.search(user_prompt, tenant)
+        return self._fuse_rewrite_results(prompt_results, rewrite_search)
+
+    async def _aretrieve(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
+    ) -> List[Any]:
+        if not self._should_rewrite(chat_history):
+            return await self.qdrant_db.asearch(user_prompt, tenant)
+
+        rewrite_search = asyncio.create_task(
+            self._asearch_rewrites(user_prompt, tenant, chat_history)
+        )
+        prompt_results = await self.qdrant_db.asearch(user_prompt, tenant)
+        return self._fuse_rewrite_results(prompt_results, rewrite_search)
+
+    def generate_response(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
     ) -> Generator[str, None, None]:
         try:
+            start = time.perf_counter()
             logger.info(f"Fetching response for user prompt: {user_prompt}")
-            prompt = AIUtils.fetch_prompt(chat_history)
-            chain = prompt | self.llm
-            additional_context = self.qdrant_db.search(user_prompt)
+            # The current prompt is already part of the history; send it only once
+            if chat_history and chat_history[-1]["content"] == user_prompt:
+                chat_history = chat_history[:-1]
+
+            chain = AIUtils.fetch_prompt() | self.llm
+            with Metrics.span("ai_service", "retrieval"):
+                search_results = self._retrieve(user_prompt, tenant, chat_history)
 
-            for chunk in chain.stream(
-                {
+            with Metrics.span("ai_service", "prompt"):
+                inputs = {
+                    "chat_history": AIUtils.trim_chat_history(
+                        chat_history, settings.HISTORY_TOKEN_BUDGET
+                    ),
                     "user_prompt": user_prompt,
-                    "additional_context": additional_context,
+                    "additional_context": AIUtils.format_context(
+                        search_results, settings.CONTEXT_TOKEN_BUDGET
+                    ),
                 }
-            ):
+
+            first_token_at = None
+            token_count = 0
+            for chunk in chain.stream(inputs):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                token_count += 1
                 yield str(chunk.content) if hasattr(chunk, "content") else str(chunk)
 
+            if first_token_at is not None:
+                self._record_stream(start, first_token_at, token_count)
+
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            yield "An error occurred while generating the response."
+
+    async def agenerate_response(
+        self, user_prompt: str, tenant: str, chat_history: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        try:
+            start = time.perf_counter()
+            logger.info(f"Fetching response for user prompt: {user_prompt}")
+            if chat_history and chat_history[-1]["content"] == user_prompt:
+                chat_history = chat_history[:-1]
+
+            chain = AIUtils.fetch_prompt() | self.llm
+
+            # History trimming runs in a worker thread while retrieval is in flight
+            with Metrics.span("ai_service", "retrieval"):
+                trimmed_history, search_results = await asyncio.gather(
+                    asyncio.to_thread(
+                        AIUtils.trim_chat_history,
+                        chat_history,
+                        settings.HISTORY_TOKEN_BUDGET,
+                    ),
+                    self._aretrieve(user_prompt, tenant, chat_history),
+                )
+
+            with Metrics.span("ai_service", "prompt"):
+                inputs = {
+                    "chat_history": trimmed_history,
+                    "user_prompt": user_prompt,
+                    "additional_context": AIUtils.format_context(
+                        search_results, settings.CONTEXT_TOKEN_BUDGET
+                    ),
+                }
+
+            first_token_at = None
+            token_count = 0
+            async for chunk in chain.astream(inputs):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                token_count += 1
+                yield str(chunk.content) if hasattr(chunk, "content") else str(chunk)
+
+            if first_token_at is not None:
+                self._record_stream(start, first_token_at, token_count)
+
+        except asyncio.CancelledError:
+            logger.info(f"Response generation cancelled for prompt: {user_prompt}")
+            raise
+
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             yield "An error occurred while generating the response."
@@ -0,0 +1,173 @@
+# app/services/ingestion_service.py
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List
+
+from bson import ObjectId
+from config import settings
+from constants import JOB_KIND_DOCUMENTS, JOB_KIND_LINKS
+from database.clients import ClientRegistry
+from database.mongodb import MongoDB
+from database.qdrant import QdrantDatabase
+from pymongo import ASCENDING, DESCENDING
+from utils.lock_utils import LockUtils
+from utils.logger import logger
+
+ACTIVE_JOB_STATUSES = ["pending", "running"]
+
+
+class IngestionService:
+    def __init__(self):
+        self.mongo_db = MongoDB.get_instance()
+        self.jobs_collection = self.mongo_db.db.ingestion_jobs
+        self.jobs_collection.create_index(
+            [("tenant", ASCENDING), ("kind", ASCENDING), ("created_at", DESCENDING)]
+        )
+        self.qdrant_db = QdrantDatabase.get_instance()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.INGESTION_MAX_WORKERS,
+            thread_name_prefix="ingestion",
+        )
+        # tenant -> job ids waiting to run, the running one first
+        self._queues: Dict[str, Deque[str]] = {}
+        self._queues_lock = threading.Lock()
+        self._resume_unfinished_jobs()
+
+    @classmethod
+    def get_instance(cls) -> "IngestionService":
+        return ClientRegistry.get_or_create("ingestion_service", cls)
+
+    def submit_job(
+        self, tenant: str, kind: str, added: List[str], removed: List[str]
+    ) -> str:
+        now = datetime.now(timezone.utc)
+        result = self.jobs_collection.insert_one(
+            {
+                "tenant": tenant,
+                "kind": kind,
+                "status": "pending",
+                "removed": removed,
+                "removed_done": not removed,
+                "items": [{"name": name, "status": "pending"} for name in added],
+                "total": len(added),
+                "completed": 0,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        job_id = str(result.inserted_id)
+        logger.info(
+            f"Submitted {kind} ingestion job {job_id} for {tenant} "
+            f"({len(added)} added, {len(removed)} removed)"
+        )
+        self._enqueue(tenant, job_id)
+        return job_id
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        return self.jobs_collection.find_one({"_id": ObjectId(job_id)})
+
+    def get_recent_jobs(
+        self, tenant: str, kind: str, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        return list(
+            self.jobs_collection.find({"tenant": tenant, "kind": kind}, {"items": 0})
+            .sort("created_at", DESCENDING)
+            .limit(limit)
+        )
+
+    def delete_tenant_jobs(self, tenant: str) -> None:
+        # Running jobs notice on their next step and stop
+        self.jobs_collection.delete_many({"tenant": tenant})
+
+    def _resume_unfinished_jobs(self) -> None:
+        # Jobs left running by a previous process pick up from their pending items
+        for job in self.jobs_collection.find(
+            {"status": {"$in": ACTIVE_JOB_STATUSES}}, {"_id": 1, "tenant": 1}
+        ).sort("created_at", ASCENDING):
+            logger.info(f"Resuming ingestion job {job['_id']}")
+            self._enqueue(job.get("tenant", settings.DEFAULT_TENANT), str(job["_id"]))
+
+    def _enqueue(self, tenant: str, job_id: str) -> None:
+        # Jobs for one tenant run in the order they were submitted, so a later
+        # removal never finishes before the job that added the same item.
+        # Different tenants still share the pool.
+        with self._queues_lock:
+            queue = self._queues.setdefault(tenant, deque())
+            queue.append(job_id)
+            if len(queue) > 1:
+                return
+        self.executor.submit(self._run_tenant_jobs, tenant)
+
+    def _run_tenant_jobs(self, tenant: str) -> None:
+        while True:
+            with self._queues_lock:
+                job_id = self._queues[tenant][0]
+            with LockUtils.tenant_lock(tenant):
+                self._run_job(job_id)
+            with self._queues_lock:
+                queue = self._queues[tenant]
+                queue.popleft()
+                if not queue:
+                    del self._queues[tenant]
+                    return
+
+    def _update_job(self, job_id: ObjectId, fields: Dict[str, Any]) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc)
+        self.jobs_collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def _sync(
+        self, tenant: str, kind: str, added: List[str], removed: List[str]
+    ) -> None:
+        if kind == JOB_KIND_DOCUMENTS:
+            self.qdrant_db.sync_document_embeddings(tenant, added, removed)
+        elif kind == JOB_KIND_LINKS:
+            link_stats = self.qdrant_db.sync_webpage_embeddings(tenant, added, removed)
+            self.mongo_db.update_link_stats(tenant, added, link_stats)
+        else:
+            raise ValueError(f"Unknown ingestion job kind: {kind}")
+
+    def _run_job(self, job_id: str) -> None:
+        object_id = ObjectId(job_id)
+        try:
+            job = self.jobs_collection.find_one({"_id": object_id})
+            if not job or job["status"] not in ACTIVE_JOB_STATUSES:
+                return
+
+            self._update_job(object_id, {"status": "running", "error": None})
+            # Jobs queued before tenants existed belong to the default tenant
+            tenant = job.get("tenant", settings.DEFAULT_TENANT)
+
+            if not job["removed_done"]:
+                self._sync(tenant, job["kind"], [], job["removed"])
+                self._update_job(object_id, {"removed_done": True})
+
+            pending = [
+                item["name"] for item in job["items"] if item["status"] != "done"
+            ]
+            step = max(1, settings.INGESTION_ITEMS_PER_STEP)
+            for i in range(0, len(pending), step):
+                if not self.jobs_collection.count_documents({"_id": object_id}):
+                    logger.info(f"Ingestion job {job_id} was deleted with its tenant")
+                    return
+
+                names = pending[i : i + step]
+                self._sync(tenant, job["kind"], names, [])
+
+                # Progress is saved per step so a restart skips finished items
+                for name in names:
+                    self.jobs_collection.update_one(
+                        {"_id": object_id, "items.name": name},
+                        {"$set": {"items.$.status": "done"}, "$inc": {"completed": 1}},
+                    )
+                self._update_job(object_id, {})
+
+            self._update_job(object_id, {"status": "completed"})
+            logger.info(f"Ingestion job {job_id} completed")
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            self._update_job(object_id, {"status": "failed", "error": str(e)})
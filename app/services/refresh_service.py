@@ -0,0 +1,132 @@
+# app/services/refresh_service.py
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+from config import settings
+from database.clients import ClientRegistry
+from database.mongodb import MongoDB
+from database.qdrant import QdrantDatabase
+from utils.database_utils import DatabaseUtils
+from utils.hash_utils import HashUtils
+from utils.lock_utils import LockUtils
+from utils.logger import logger
+
+
+class RefreshService:
+    def __init__(self):
+        self.mongo_db = MongoDB.get_instance()
+        self.qdrant_db = QdrantDatabase.get_instance()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if settings.LINK_REFRESH_ENABLED:
+            self._thread = threading.Thread(
+                target=self._run, name="link-refresh", daemon=True
+            )
+            self._thread.start()
+
+    @classmethod
+    def get_instance(cls) -> "RefreshService":
+        return ClientRegistry.get_or_create("refresh_service", cls)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(settings.LINK_REFRESH_CHECK_SECONDS):
+            try:
+                self.refresh_due_links()
+            except Exception as e:
+                logger.error(f"Error refreshing links: {str(e)}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def refresh_due_links(self) -> Dict[str, int]:
+        fetched_before = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.LINK_REFRESH_INTERVAL_SECONDS
+        )
+        links = self.mongo_db.get_links_due_for_refresh(
+            fetched_before, settings.LINK_REFRESH_BATCH_SIZE
+        )
+        links_by_tenant: Dict[str, List[Dict[str, Any]]] = {}
+        for link in links:
+            links_by_tenant.setdefault(link["tenant"], []).append(link)
+
+        counts: Dict[str, int] = {}
+        for tenant, tenant_links in links_by_tenant.items():
+            for name, count in self.refresh_links(tenant, tenant_links).items():
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+    def refresh_links(self, tenant: str, links: List[Dict[str, Any]]) -> Dict[str, int]:
+        # Holding the tenant lock keeps ingestion jobs from removing a link
+        # while it is being embedded again. A link removed after it was picked
+        # for this refresh is skipped, or its chunks would outlive it.
+        with LockUtils.tenant_lock(tenant):
+            existing_links = self.mongo_db.get_existing_links(
+                tenant, [link["url"] for link in links]
+            )
+            links = [link for link in links if link["url"] in existing_links]
+            if not links:
+                return {}
+            return self._refresh_links(tenant, links)
+
+    def _refresh_links(
+        self, tenant: str, links: List[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        # Unchanged pages cost one conditional request; only pages whose
+        # normalized content changed are re-chunked, and the incremental diff
+        # in embed_documents re-embeds just the chunks that differ
+        urls = [link["url"] for link in links]
+        known_links = {link["url"]: link for link in links}
+        link_stats: Dict[str, Dict[str, Any]] = {}
+        changed_links: List[str] = []
+        counts = {"not_modified": 0, "unchanged": 0, "changed": 0, "failed": 0}
+
+        def iter_changed_docs() -> Iterator[Any]:
+            for url, result in DatabaseUtils.iter_webpages(
+                urls, known_links, settings.LINK_REFRESH_MAX_CONCURRENCY
+            ):
+                stats = {
+                    "etag": result["etag"],
+                    "last_modified": result["last_modified"],
+                }
+                link_stats[url] = stats
+                if result["docs"] is None:
+                    counts["not_modified"] += 1
+                    continue
+
+                content_hash = HashUtils.normalized_content_hash(
+                    "".join(doc.page_content for doc in result["docs"])
+                )
+                if content_hash == known_links[url].get("content_hash"):
+                    counts["unchanged"] += 1
+                    continue
+
+                stats["content_hash"] = content_hash
+                changed_links.append(url)
+                counts["changed"] += 1
+                yield from result["docs"]
+
+        try:
+            chunk_counts = self.qdrant_db.embed_documents(
+                iter_changed_docs(), tenant, field_key="source_url"
+            )
+            for url in changed_links:
+                link_stats[url]["chunk_count"] = chunk_counts.get(url, 0)
+        except Exception:
+            # Keep the old hash and validators so these pages are fetched
+            # and embedded again on the next pass
+            for url in changed_links:
+                link_stats.pop(url, None)
+            raise
+        finally:
+            # Links handled before a failure still record their progress
+            counts["failed"] = len(urls) - len(link_stats)
+            self.mongo_db.update_link_stats(tenant, urls, link_stats)
+
+        logger.info(
+            f"Refreshed {len(urls)} links for {tenant}: {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['not_modified']} not modified, "
+            f"{counts['failed']} failed"
+        )
+        return counts
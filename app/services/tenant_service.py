@@ -0,0 +1,52 @@
+# app/services/tenant_service.py
+
+from typing import List
+
+from config import settings
+from database.clients import ClientRegistry
+from database.mongodb import MongoDB
+from database.qdrant import QdrantDatabase
+from database.s3 import S3Storage
+from services.ingestion_service import IngestionService
+from utils.logger import logger
+from utils.validation_utils import ValidationUtils
+
+
+class TenantService:
+    def __init__(self):
+        self.mongo_db = MongoDB.get_instance()
+        self.qdrant_db = QdrantDatabase.get_instance()
+        self.s3 = S3Storage.get_instance()
+        self.ingestion_service = IngestionService.get_instance()
+
+    @classmethod
+    def get_instance(cls) -> "TenantService":
+        return ClientRegistry.get_or_create("tenant_service", cls)
+
+    def get_tenants(self) -> List[str]:
+        return self.mongo_db.get_tenants()
+
+    def create_tenant(self, tenant: str) -> None:
+        if not ValidationUtils.is_tenant_valid(tenant):
+            raise ValueError(
+                "Knowledge base names use lowercase letters, digits, `-` and `_`"
+            )
+        self.mongo_db.add_tenant(tenant)
+        logger.info(f"Created tenant {tenant}")
+
+    def delete_tenant(self, tenant: str) -> None:
+        if tenant == settings.DEFAULT_TENANT:
+            raise ValueError("The default knowledge base cannot be deleted")
+
+        # Jobs go first so a running one stops at its next step. The embeddings
+        # are one filtered delete; S3 needs one request per 1000 files.
+        try:
+            self.ingestion_service.delete_tenant_jobs(tenant)
+            self.qdrant_db.delete_tenant(tenant)
+            self.s3.delete_tenant(tenant)
+            self.mongo_db.delete_tenant(tenant)
+            logger.info(f"Deleted tenant {tenant}")
+
+        except Exception as e:
+            logger.error(f"Failed to delete tenant {tenant}: {str(e)}")
+            raise Exception(f"Failed to delete tenant {tenant}: {str(e)}")
@@ -1,36 +1,74 @@
-from typing import Dict, List
+import re
+from typing import Any, Dict, List, Tuple
 
-from langchain.prompts import ChatPromptTemplate
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from utils.token_utils import TokenUtils
+
+SYSTEM_PROMPT = """
+You are a helpful, knowledgeable, and kind assistant. Your role is to answer user questions using the context retrieved from uploaded files and provided links.
+
+Please follow these guidelines carefully:
+
+1. **Always begin your response by listing the sources used** to answer the user's question. Use a clear and readable format (e.g., filenames, URLs, page numbers, etc.) before giving the actual answer.
+2. Only use the provided context to answer the user's question. If the answer is not available in the context, respond politely and **do not** guess.
+3. If the question requires real-time data or falls outside the scope of the context, use your available tools (e.g., web search) if permitted.
+4. Be thorough yet concise — like a friendly, thoughtful teacher who wants the user to understand deeply.
+5. If the user asks for clarification (e.g., "Explain this" or "What does this mean?"), provide an insightful and easy-to-understand explanation.
+6. Always be respectful. Never respond with anything inappropriate, offensive, or irrelevant.
+""".strip()
+
+# Built once at import; only the history and the context vary between turns
+CHAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        SystemMessage(content=SYSTEM_PROMPT),
+        MessagesPlaceholder("chat_history"),
+        (
+            "human",
+            "Here is the relevant context: {additional_context}\nHere is the user's current question: {user_prompt}",
+        ),
+    ]
+)
+
+QUERY_REWRITE_PROMPT = """
+You write search queries for a knowledge base of uploaded files and webpages.
+
+Rewrite the user's latest question as one standalone search query that can be understood without the conversation: resolve pronouns and references such as "it" or "the second one" from the chat history. {expansion_instructions}
+Write each query on its own line with no numbering or commentary.
+""".strip()
+
+QUERY_REWRITE_CHAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", QUERY_REWRITE_PROMPT),
+        MessagesPlaceholder("chat_history"),
+        ("human", "Latest question: {user_prompt}"),
+    ]
+)
+
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
 
 
 class AIUtils:
     @staticmethod
-    def fetch_prompt(chat_history: List[Dict[str, str]]):
-        formatted_chat_history = AIUtils.format_chat_history(chat_history)
-        return ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(
-                    content="""
-                        You are a helpful, knowledgeable, and kind assistant. Your role is to answer user questions using the context retrieved from uploaded files and provided links.
-
-                        Please follow these guidelines carefully:
-
-                        1. **Always begin your response by listing the sources used** to answer the user's question. Use a clear and readable format (e.g., filenames, URLs, page numbers, etc.) before giving the actual answer.
-                        2. Only use the provided context to answer the user's question. If the answer is not available in the context, respond politely and **do not** guess.
-                        3. If the question requires real-time data or falls outside the scope of the context, use your available tools (e.g., web search) if permitted.
-                        4. Be thorough yet concise — like a friendly, thoughtful teacher who wants the user to understand deeply.
-                        5. If the user asks for clarification (e.g., "Explain this" or "What does this mean?"), provide an insightful and easy-to-understand explanation.
-                        6. Always be respectful. Never respond with anything inappropriate, offensive, or irrelevant.
-                    """.strip()
-                ),
-                *formatted_chat_history,
-                (
-                    "human",
-                    "Here is the relevant context: {additional_context}\nHere is the user's current question: {user_prompt}",
-                ),
-            ]
-        )
+    def fetch_prompt() -> ChatPromptTemplate:
+        return CHAT_PROMPT
+
+    @staticmethod
+    def fetch_query_rewrite_prompt() -> ChatPromptTemplate:
+        return QUERY_REWRITE_CHAT_PROMPT
+
+    @staticmethod
+    def parse_queries(text: str, max_queries: int) -> List[str]:
+        # Models sometimes number or bullet the lines despite the instructions
+        queries = []
+        seen = set()
+        for line in text.splitlines():
+            query = LIST_MARKER_PATTERN.sub("", line).strip().strip('"')
+            key = " ".join(query.casefold().split())
+            if query and key not in seen:
+                queries.append(query)
+                seen.add(key)
+        return queries[:max_queries]
 
     @staticmethod
     def format_chat_history(
@@ -43,3 +81,77 @@ class AIUtils:
             elif chat["role"] == "ai":
                 message_history_messages.append(AIMessage(content=chat["content"]))
         return message_history_messages
+
+    @staticmethod
+    def trim_chat_history(
+        chat_history: List[Dict[str, str]], token_budget: int
+    ) -> List[HumanMessage | AIMessage]:
+        # Keep the most recent turns that fit the budget and drop older ones
+        kept: List[Dict[str, str]] = []
+        used_tokens = 0
+        for chat in reversed(chat_history):
+            message_tokens = TokenUtils.count_tokens(chat["content"])
+            if used_tokens + message_tokens > token_budget:
+                break
+            kept.append(chat)
+            used_tokens += message_tokens
+
+        return AIUtils.format_chat_history(list(reversed(kept)))
+
+    @staticmethod
+    def _get_citation(metadata: Dict[str, Any]) -> str:
+        source = (
+            metadata.get("source_url")
+            or metadata.get("source_filename")
+            or metadata.get("source", "unknown")
+        )
+        if "page" in metadata:
+            return f"{source} (page {metadata['page'] + 1})"
+        return str(source)
+
+    @staticmethod
+    def _get_span(doc: Any) -> Tuple[str, int, int]:
+        start = doc.metadata.get("start_index", 0)
+        return (
+            AIUtils._get_citation(doc.metadata),
+            start,
+            start + len(doc.page_content),
+        )
+
+    @staticmethod
+    def dedupe_documents(docs: List[Any]) -> List[Any]:
+        # Splitter overlap means neighbouring hits often repeat the same text
+        unique_docs = []
+        spans: List[Tuple[str, int, int]] = []
+        seen_contents = set()
+        for doc in docs:
+            if doc.page_content in seen_contents:
+                continue
+
+            source, start, end = AIUtils._get_span(doc)
+            overlaps = any(
+                source == kept_source
+                and min(end, kept_end) - max(start, kept_start) > (end - start) / 2
+                for kept_source, kept_start, kept_end in spans
+            )
+            if overlaps:
+                continue
+
+            unique_docs.append(doc)
+            spans.append((source, start, end))
+            seen_contents.add(doc.page_content)
+        return unique_docs
+
+    @staticmethod
+    def format_context(docs: List[Any], token_budget: int) -> str:
+        sections = []
+        used_tokens = 0
+        for index, doc in enumerate(AIUtils.dedupe_documents(docs), start=1):
+            section = f"[{index}] {AIUtils._get_citation(doc.metadata)}\n{doc.page_content.strip()}"
+            section_tokens = TokenUtils.count_tokens(section)
+            if used_tokens + section_tokens > token_budget:
+                break
+            sections.append(section)
+            used_tokens += section_tokens
+
+        return "\n\n".join(sections) if sections else "No relevant context found."
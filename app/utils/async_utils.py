@@ -0,0 +1,46 @@
+# app/utils/async_utils.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncGenerator, Coroutine, Generator, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+class AsyncUtils:
+    @staticmethod
+    def get_event_loop() -> asyncio.AbstractEventLoop:
+        # One loop per process so async clients and their connection pools are
+        # shared by every chat session instead of being rebuilt per request
+        global _loop
+        with _loop_lock:
+            if _loop is None:
+                _loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=_loop.run_forever, name="ragify-event-loop", daemon=True
+                ).start()
+            return _loop
+
+    @staticmethod
+    def submit(coroutine: Coroutine[Any, Any, Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, AsyncUtils.get_event_loop())
+
+    @staticmethod
+    def iterate(async_gen: AsyncGenerator[Any, None]) -> Generator[Any, None, None]:
+        pending: Optional[Future] = None
+        try:
+            while True:
+                pending = AsyncUtils.submit(async_gen.__anext__())
+                try:
+                    item = pending.result()
+                except StopAsyncIteration:
+                    break
+                pending = None
+                yield item
+        finally:
+            # Reached when the consumer stops early, e.g. the user navigates away
+            if pending is not None and not pending.done():
+                pending.cancel()
+            AsyncUtils.submit(async_gen.aclose())
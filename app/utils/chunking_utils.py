@@ -0,0 +1,121 @@
+# app/utils/chunking_utils.py
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple
+
+from config import settings
+from constants import CHUNKING_PROFILES, CHUNKING_SEPARATORS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.extraction_utils import ExtractionUtils
+from utils.metrics import Metrics
+from utils.token_utils import count_tokens
+
+
+@lru_cache(maxsize=None)
+def _get_splitter(source_type: str) -> RecursiveCharacterTextSplitter:
+    profile = ChunkingUtils.get_profile(source_type)
+    return RecursiveCharacterTextSplitter(
+        separators=CHUNKING_SEPARATORS,
+        is_separator_regex=True,
+        chunk_size=profile["chunk_size"],
+        chunk_overlap=profile["chunk_overlap"],
+        length_function=count_tokens,
+        add_start_index=True,
+    )
+
+
+# Runs inside worker processes, so it must stay a picklable module-level function
+def _chunk_batch(docs: List[Any]) -> Tuple[List[Any], float]:
+    start = time.perf_counter()
+    chunks = [chunk for doc in docs for chunk in ChunkingUtils.chunk_document(doc)]
+    return chunks, time.perf_counter() - start
+
+
+class ChunkingUtils:
+    @staticmethod
+    def get_source_type(metadata: Dict[str, Any]) -> str:
+        if metadata.get("source_url"):
+            return "webpage"
+        if "page" in metadata:
+            return "pdf"
+        return "text"
+
+    @staticmethod
+    def get_profile(source_type: str) -> Dict[str, int]:
+        return {
+            **CHUNKING_PROFILES[source_type],
+            **settings.CHUNKING_OVERRIDES.get(source_type, {}),
+        }
+
+    @staticmethod
+    def get_average_chunk_size() -> float:
+        sizes = [
+            ChunkingUtils.get_profile(source_type)["chunk_size"]
+            for source_type in CHUNKING_PROFILES
+        ]
+        return sum(sizes) / len(sizes)
+
+    @staticmethod
+    def chunk_document(doc: Any) -> List[Any]:
+        # PDFs arrive one document per page, so no chunk spans two pages
+        splitter = _get_splitter(ChunkingUtils.get_source_type(doc.metadata))
+        return splitter.split_documents([doc])
+
+    @staticmethod
+    def _iter_batches(documents: Iterable[Any]) -> Iterator[List[Any]]:
+        batch: List[Any] = []
+        batch_chars = 0
+        for doc in documents:
+            batch.append(doc)
+            batch_chars += len(doc.page_content)
+            if batch_chars >= settings.CHUNKING_BATCH_CHARS:
+                yield batch
+                batch, batch_chars = [], 0
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _collect(result: Tuple[List[Any], float]) -> List[Any]:
+        chunks, seconds = result
+        Metrics.observe(
+            "ragify_stage_duration_seconds",
+            seconds,
+            component="ingestion",
+            stage="chunk",
+        )
+        return chunks
+
+    @staticmethod
+    def iter_chunked(documents: Iterable[Any]) -> Iterator[List[Any]]:
+        # Batches are split in the process pool a few at a time ahead of the
+        # consumer and yielded in document order, so chunk indexes stay stable
+        batches = ChunkingUtils._iter_batches(documents)
+        first_batch = next(batches, None)
+        if first_batch is None:
+            return
+
+        second_batch = next(batches, None)
+        if second_batch is None:
+            # A single small batch is cheaper to split here than to ship out
+            yield ChunkingUtils._collect(_chunk_batch(first_batch))
+            return
+
+        pool = ExtractionUtils.get_process_pool()
+        max_in_flight = 2 * (settings.EXTRACTION_MAX_WORKERS or os.cpu_count() or 1)
+        in_flight: Deque[Future] = deque(
+            [
+                pool.submit(_chunk_batch, first_batch),
+                pool.submit(_chunk_batch, second_batch),
+            ]
+        )
+        for batch in batches:
+            while len(in_flight) >= max_in_flight:
+                yield ChunkingUtils._collect(in_flight.popleft().result())
+            in_flight.append(pool.submit(_chunk_batch, batch))
+
+        while in_flight:
+            yield ChunkingUtils._collect(in_flight.popleft().result())
@@ -1,75 +1,255 @@
 # app/utils/database_utils.py
 
+import os
+import re
 import tempfile
-from typing import Any, List, Optional
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import requests
+from bs4 import BeautifulSoup
+from config import settings
 from database.s3 import S3Storage
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    WebBaseLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders.web_base import default_header_template
+from langchain_core.documents import Document
+from utils.chunking_utils import ChunkingUtils
+from utils.extraction_utils import ExtractionUtils
+from utils.hash_utils import HashUtils
 from utils.logger import logger
+from utils.metrics import Metrics
+from utils.rate_limiter import HostRateLimiter
 
-s3 = S3Storage()
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    # One pooled session keeps connections to the same hosts alive across fetches
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(default_header_template)
+        return _session
 
 
 class DatabaseUtils:
     @staticmethod
-    def get_webpage_text(url: str) -> Optional[List[Any]]:
+    def get_page_metadata(soup: BeautifulSoup, url: str) -> Dict[str, str]:
+        # Same fields WebBaseLoader records, so stored pages keep their metadata
+        metadata = {"source": url}
+        if title := soup.find("title"):
+            metadata["title"] = title.get_text()
+        if description := soup.find("meta", attrs={"name": "description"}):
+            metadata["description"] = description.get(
+                "content", "No description found."
+            )
+        if html := soup.find("html"):
+            metadata["language"] = html.get("lang", "No language found.")
+        return metadata
+
+    @staticmethod
+    def fetch_webpage(
+        url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        # Parses pages the same way WebBaseLoader does, but keeps the response
+        # validators so later refreshes can ask the server whether anything changed
         try:
             logger.info(f"Fetching content from webpage: {url}")
-            loader = WebBaseLoader([url])
-            docs = loader.load()
-            if docs and len(docs) > 0:
-                for doc in docs:
-                    doc.metadata["source_url"] = url
-                logger.info(f"Successfully fetched content from webpage: {url}")
-                return docs
-            return None
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+            with Metrics.span("ingestion", "fetch_webpage"):
+                response = _get_session().get(
+                    url, headers=headers, timeout=settings.WEB_FETCH_TIMEOUT_SECONDS
+                )
+            if response.status_code == 304:
+                logger.info(f"Webpage not modified: {url}")
+                Metrics.inc(
+                    "ragify_fetched_sources_total",
+                    kind="webpage",
+                    result="not_modified",
+                )
+                return {
+                    "docs": None,
+                    "etag": response.headers.get("ETag", etag),
+                    "last_modified": response.headers.get(
+                        "Last-Modified", last_modified
+                    ),
+                }
+
+            response.raise_for_status()
+            with Metrics.span("ingestion", "parse_webpage"):
+                response.encoding = response.apparent_encoding
+                soup = BeautifulSoup(response.text, "html.parser")
+                # Marked like markdown headings so the chunker splits on them
+                for heading in soup.find_all(re.compile(r"^h[1-6]$")):
+                    heading.insert_before(f"\n{'#' * int(heading.name[1])} ")
+                doc = Document(
+                    page_content=soup.get_text(),
+                    metadata=DatabaseUtils.get_page_metadata(soup, url),
+                )
+            doc.metadata["source_url"] = url
+            logger.info(f"Successfully fetched content from webpage: {url}")
+            Metrics.inc(
+                "ragify_fetched_sources_total", kind="webpage", result="success"
+            )
+            return {
+                "docs": [doc],
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
         except Exception as e:
             logger.error(f"Error fetching webpage content: {str(e)}")
+            Metrics.inc(
+                "ragify_fetched_sources_total", kind="webpage", result="failure"
+            )
             return None
 
     @staticmethod
-    def get_document_text(s3_filename: str) -> Optional[List[Any]]:
-        try:
-            file_content, content_type = s3.download_file(s3_filename)
+    def _iter_concurrently(
+        func: Callable[[str], Any], items: List[str], max_workers: int
+    ) -> Iterator[Tuple[str, Any]]:
+        # Submits at most two tasks per worker ahead of the consumer, so finished
+        # results never pile up in memory while downstream stages catch up
+        max_workers = max(1, min(max_workers, len(items)))
+        pending_items = iter(items)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(func, item): item
+                for item in islice(pending_items, max_workers * 2)
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = futures.pop(future)
+                    result = future.result()
+                    if result:
+                        yield item, result
+
+                for item in islice(pending_items, len(done)):
+                    futures[executor.submit(func, item)] = item
 
-            if content_type == "application/pdf":
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".pdf"
-                ) as tmp_file:
-                    tmp_file.write(file_content)
-                    tmp_path = tmp_file.name
-                loader = PyPDFLoader(tmp_path)
+    @staticmethod
+    def iter_webpages(
+        urls: List[str],
+        validators: Optional[Dict[str, Dict[str, Any]]] = None,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        validators = validators or {}
+        rate_limiter = HostRateLimiter(
+            per_host_limit=settings.WEB_FETCH_PER_HOST_LIMIT,
+            min_interval_seconds=settings.WEB_FETCH_HOST_DELAY_SECONDS,
+        )
 
-            elif content_type == "text/plain":
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".txt"
-                ) as tmp_file:
-                    tmp_file.write(file_content)
-                    tmp_path = tmp_file.name
-                loader = TextLoader(tmp_path)
+        def fetch(url: str) -> Optional[Dict[str, Any]]:
+            with rate_limiter.acquire(url):
+                return DatabaseUtils.fetch_webpage(
+                    url,
+                    validators.get(url, {}).get("etag"),
+                    validators.get(url, {}).get("last_modified"),
+                )
 
-            else:
-                raise ValueError(f"Unsupported file type: {content_type}")
+        fetched = 0
+        for url, result in DatabaseUtils._iter_concurrently(
+            fetch, urls, max_workers or settings.WEB_FETCH_MAX_CONCURRENCY
+        ):
+            fetched += 1
+            yield url, result
 
-            docs = loader.load()
+        logger.info(f"Fetched content from {fetched}/{len(urls)} webpages")
+
+    @staticmethod
+    def get_document_text(tenant: str, s3_filename: str) -> Optional[List[Any]]:
+        try:
+            # Streamed to disk, where the extraction workers read it directly
+            file_obj = tempfile.NamedTemporaryFile(delete=False)
+            try:
+                with file_obj:
+                    content_type = S3Storage.get_instance().download_file(
+                        tenant, s3_filename, file_obj
+                    )
+                with Metrics.span("ingestion", "extract_document"):
+                    docs = ExtractionUtils.extract_documents(
+                        file_obj.name, content_type, s3_filename
+                    )
+            finally:
+                os.remove(file_obj.name)
 
             for doc in docs:
                 doc.metadata["source_filename"] = s3_filename
 
+            Metrics.inc(
+                "ragify_fetched_sources_total", kind="document", result="success"
+            )
             return docs if docs else None
 
         except Exception as e:
             logger.error(f"Error fetching document text: {str(e)}")
+            Metrics.inc(
+                "ragify_fetched_sources_total", kind="document", result="failure"
+            )
             return None
 
     @staticmethod
-    def chunk_documents(docs: List[Any]) -> List[Any]:
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200, add_start_index=True
-        )
-        return splitter.split_documents(docs)
+    def iter_documents_text(
+        tenant: str, s3_filenames: List[str]
+    ) -> Iterator[Tuple[str, List[Any]]]:
+        # Threads only download and wait; PDF parsing runs in the process pool
+        extracted = 0
+        for filename, docs in DatabaseUtils._iter_concurrently(
+            partial(DatabaseUtils.get_document_text, tenant),
+            s3_filenames,
+            settings.EXTRACTION_MAX_FILES,
+        ):
+            extracted += 1
+            yield filename, docs
+
+        logger.info(f"Extracted text from {extracted}/{len(s3_filenames)} files")
+
+    @staticmethod
+    def get_source(metadata: Dict[str, Any]) -> Optional[str]:
+        return metadata.get("source_url") or metadata.get("source_filename")
+
+    @staticmethod
+    def get_source_id(tenant: str, field_key: str, source: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{tenant}:{field_key}:{source}"))
+
+    @staticmethod
+    def assign_chunk_ids(
+        chunks: List[Any], chunk_counts: Optional[Dict[Optional[str], int]] = None
+    ) -> List[str]:
+        point_ids = []
+        # Callers streaming a source in several pieces pass the same counts along
+        chunk_counts = {} if chunk_counts is None else chunk_counts
+
+        for chunk in chunks:
+            source = DatabaseUtils.get_source(chunk.metadata)
+            chunk_index = chunk_counts.get(source, 0)
+            chunk_counts[source] = chunk_index + 1
+
+            chunk_hash = HashUtils.content_hash(chunk.page_content)
+            chunk.metadata["chunk_index"] = chunk_index
+            chunk.metadata["chunk_hash"] = chunk_hash
+            point_key = f"{source}:{chunk_index}:{chunk_hash}"
+            # The default tenant keeps the IDs chunks had before tenants existed
+            tenant = chunk.metadata.get("tenant_id", settings.DEFAULT_TENANT)
+            if tenant != settings.DEFAULT_TENANT:
+                point_key = f"{tenant}:{point_key}"
+            point_ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, point_key)))
+
+        return point_ids
+
+    @staticmethod
+    def iter_chunks(documents: Iterable[Any]) -> Iterator[Tuple[str, Any]]:
+        chunk_counts: Dict[Optional[str], int] = {}
+        for chunks in ChunkingUtils.iter_chunked(documents):
+            point_ids = DatabaseUtils.assign_chunk_ids(chunks, chunk_counts)
+            yield from zip(point_ids, chunks)
@@ -0,0 +1,87 @@
+# app/utils/extraction_utils.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from config import settings
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+# Runs inside worker processes, so it must stay a picklable module-level function.
+# Tasks get the path rather than the bytes, and reading from an open file lets
+# pypdf load only the cross-reference table and the pages in the range.
+def _extract_pdf_page_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    with open(path, "rb") as pdf_file:
+        reader = PdfReader(pdf_file)
+        return [(page, reader.pages[page].extract_text()) for page in range(start, end)]
+
+
+class ExtractionUtils:
+    @staticmethod
+    def get_process_pool() -> ProcessPoolExecutor:
+        global _process_pool
+        with _process_pool_lock:
+            if _process_pool is None:
+                # Spawn avoids forking a process that already runs Streamlit threads
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=settings.EXTRACTION_MAX_WORKERS or os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return _process_pool
+
+    @staticmethod
+    def extract_pdf(path: str, source: str) -> List[Document]:
+        # Workers share the file on disk instead of each task being sent its
+        # own copy of the bytes
+        with open(path, "rb") as pdf_file:
+            total_pages = len(PdfReader(pdf_file).pages)
+        pages_per_task = max(1, settings.PDF_PAGES_PER_TASK)
+
+        pool = ExtractionUtils.get_process_pool()
+        futures = [
+            pool.submit(
+                _extract_pdf_page_range,
+                path,
+                start,
+                min(start + pages_per_task, total_pages),
+            )
+            for start in range(0, total_pages, pages_per_task)
+        ]
+
+        docs = []
+        for future in futures:
+            for page, text in future.result():
+                docs.append(
+                    Document(
+                        page_content=text,
+                        metadata={
+                            "source": source,
+                            "page": page,
+                            "total_pages": total_pages,
+                        },
+                    )
+                )
+        return docs
+
+    @staticmethod
+    def extract_text(path: str, source: str) -> List[Document]:
+        with open(path, encoding="utf-8", errors="replace") as text_file:
+            return [
+                Document(page_content=text_file.read(), metadata={"source": source})
+            ]
+
+    @staticmethod
+    def extract_documents(path: str, content_type: str, source: str) -> List[Document]:
+        if content_type == "application/pdf":
+            return ExtractionUtils.extract_pdf(path, source)
+        elif content_type == "text/plain":
+            return ExtractionUtils.extract_text(path, source)
+        else:
+            raise ValueError(f"Unsupported file type: {content_type}")
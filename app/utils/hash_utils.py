@@ -0,0 +1,14 @@
+# app/utils/hash_utils.py
+
+import hashlib
+
+
+class HashUtils:
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalized_content_hash(text: str) -> str:
+        # Whitespace-only edits to a page should not count as a change
+        return HashUtils.content_hash(" ".join(text.split()))
@@ -0,0 +1,16 @@
+# app/utils/lock_utils.py
+
+import threading
+from typing import Dict
+
+_tenant_locks: Dict[str, threading.RLock] = {}
+_tenant_locks_lock = threading.Lock()
+
+
+class LockUtils:
+    @staticmethod
+    def tenant_lock(tenant: str) -> threading.RLock:
+        # Ingestion jobs and link refreshes both write a tenant's embeddings;
+        # taking this lock keeps one from re-adding what the other removed
+        with _tenant_locks_lock:
+            return _tenant_locks.setdefault(tenant, threading.RLock())
@@ -0,0 +1,219 @@
+# app/utils/metrics.py
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Generator, List, Tuple
+
+from config import settings
+from utils.logger import logger
+
+LATENCY_BUCKETS = [
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+]
+RATE_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+# name -> (type, help, buckets)
+METRIC_DEFINITIONS = {
+    "ragify_stage_duration_seconds": (
+        "histogram",
+        "Time spent in each pipeline stage.",
+        LATENCY_BUCKETS,
+    ),
+    "ragify_llm_time_to_first_token_seconds": (
+        "histogram",
+        "Time from receiving a prompt to streaming the first token.",
+        LATENCY_BUCKETS,
+    ),
+    "ragify_llm_tokens_per_second": (
+        "histogram",
+        "Streaming rate of generated responses after the first token.",
+        RATE_BUCKETS,
+    ),
+    "ragify_llm_output_tokens_total": (
+        "counter",
+        "Tokens generated by the LLM.",
+        None,
+    ),
+    "ragify_embedding_batch_seconds": (
+        "histogram",
+        "Latency of embeddings API requests for document batches.",
+        LATENCY_BUCKETS,
+    ),
+    "ragify_embedding_texts_total": (
+        "counter",
+        "Texts embedded, split by whether the embedding cache served them.",
+        None,
+    ),
+    "ragify_ingested_chunks_total": (
+        "counter",
+        "Chunks produced by ingestion, split by whether they were upserted.",
+        None,
+    ),
+    "ragify_search_cache_requests_total": (
+        "counter",
+        "Search requests, split by search cache result.",
+        None,
+    ),
+    "ragify_query_rewrites_total": (
+        "counter",
+        "Follow-up prompts sent for rewriting, split by outcome.",
+        None,
+    ),
+    "ragify_fetched_sources_total": (
+        "counter",
+        "Files and webpages fetched for ingestion, split by outcome.",
+        None,
+    ),
+    "ragify_s3_bytes_total": (
+        "counter",
+        "Bytes transferred to and from S3.",
+        None,
+    ),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+_lock = threading.Lock()
+_server_started = False
+
+
+class Metrics:
+    @staticmethod
+    def _label_key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    @staticmethod
+    def inc(name: str, value: float = 1, **labels: str) -> None:
+        key = Metrics._label_key(labels)
+        with _lock:
+            series = _counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    @staticmethod
+    def observe(name: str, value: float, **labels: str) -> None:
+        # Stored as per-bucket counts followed by the running sum and count
+        buckets = METRIC_DEFINITIONS[name][2]
+        key = Metrics._label_key(labels)
+        with _lock:
+            series = _histograms.setdefault(name, {})
+            values = series.setdefault(key, [0.0] * (len(buckets) + 3))
+            values[bisect.bisect_left(buckets, value)] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    @staticmethod
+    @contextmanager
+    def span(component: str, stage: str) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Metrics.observe(
+                "ragify_stage_duration_seconds",
+                time.perf_counter() - start,
+                component=component,
+                stage=stage,
+            )
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ""
+        return (
+            "{"
+            + ",".join(f'{name}="{Metrics._escape(value)}"' for name, value in pairs)
+            + "}"
+        )
+
+    @staticmethod
+    def render() -> str:
+        lines = []
+        with _lock:
+            for name, (metric_type, help_text, buckets) in METRIC_DEFINITIONS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type == "counter":
+                    for key, value in _counters.get(name, {}).items():
+                        lines.append(f"{name}{Metrics._format_labels(key)} {value}")
+                    continue
+
+                for key, values in _histograms.get(name, {}).items():
+                    cumulative = 0.0
+                    for bound, count in zip(buckets + [float("inf")], values):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else str(bound)
+                        labels = Metrics._format_labels(key, (("le", le),))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = Metrics._format_labels(key)
+                    lines.append(f"{name}_sum{labels} {values[-2]}")
+                    lines.append(f"{name}_count{labels} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def start_server() -> None:
+        # Streamlit reruns page scripts constantly; only the first call binds
+        global _server_started
+        if not settings.METRICS_ENABLED:
+            return
+
+        with _lock:
+            if _server_started:
+                return
+            _server_started = True
+
+        try:
+            server = ThreadingHTTPServer(
+                (settings.METRICS_HOST, settings.METRICS_PORT), MetricsHandler
+            )
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint: {str(e)}")
+            return
+
+        threading.Thread(
+            target=server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        logger.info(
+            f"Serving metrics on http://{settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics"
+        )
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = Metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
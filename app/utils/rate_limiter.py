@@ -0,0 +1,41 @@
+# app/utils/rate_limiter.py
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    def __init__(self, per_host_limit: int, min_interval_seconds: float) -> None:
+        self.per_host_limit = per_host_limit
+        self.min_interval_seconds = min_interval_seconds
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    @contextmanager
+    def acquire(self, url: str) -> Iterator[None]:
+        host = self.get_host(url)
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.per_host_limit)
+            )
+
+        with semaphore:
+            # Reserve the next start slot for this host so requests stay spaced out
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start_at + self.min_interval_seconds
+
+            delay = start_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            yield
@@ -0,0 +1,48 @@
+# app/utils/tenant_utils.py
+
+from config import settings
+from external.streamlit import st
+from services.tenant_service import TenantService
+
+
+class TenantUtils:
+    @staticmethod
+    def select_tenant() -> str:
+        # Every page renders the same sidebar, so the chosen knowledge base
+        # follows the user from page to page
+        tenant_service = TenantService.get_instance()
+        tenants = tenant_service.get_tenants()
+        if st.session_state.get("tenant") not in tenants:
+            st.session_state.tenant = settings.DEFAULT_TENANT
+            if settings.DEFAULT_TENANT not in tenants:
+                tenants.insert(0, settings.DEFAULT_TENANT)
+
+        with st.sidebar:
+            st.session_state.tenant = st.selectbox(
+                "Knowledge base",
+                tenants,
+                index=tenants.index(st.session_state.tenant),
+            )
+
+            with st.popover("Manage knowledge bases"):
+                with st.form("create_tenant_form", clear_on_submit=True):
+                    new_tenant = st.text_input("Name", placeholder="team-name")
+                    if st.form_submit_button("Create"):
+                        try:
+                            tenant_service.create_tenant(new_tenant.strip())
+                            st.session_state.tenant = new_tenant.strip()
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
+
+                if st.session_state.tenant != settings.DEFAULT_TENANT and st.button(
+                    f"Delete {st.session_state.tenant}", type="primary"
+                ):
+                    try:
+                        tenant_service.delete_tenant(st.session_state.tenant)
+                        st.session_state.tenant = settings.DEFAULT_TENANT
+                        st.rerun()
+                    except Exception as e:
+                        st.error(str(e))
+
+        return st.session_state.tenant
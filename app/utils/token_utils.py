@@ -0,0 +1,37 @@
+# app/utils/token_utils.py
+
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+from constants import TOKENIZER_ENCODING
+from utils.logger import logger
+
+
+@lru_cache(maxsize=1)
+def _get_encoding() -> Optional[tiktoken.Encoding]:
+    # tiktoken downloads the encoding on first use; without network, token
+    # counts are estimated instead of failing every chat turn and ingestion job
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"Estimating token counts, tokenizer unavailable: {str(e)}")
+        return None
+
+
+# Module-level so the chunker can pass it to worker processes
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenUtils:
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        return count_tokens(text)
+
+    @staticmethod
+    def is_estimated() -> bool:
+        return _get_encoding() is None
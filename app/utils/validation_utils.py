@@ -14,3 +14,8 @@ class ValidationUtils:
             return False
 
         return True
+
+    @staticmethod
+    def is_tenant_valid(tenant: str) -> bool:
+        # Tenant names become S3 key prefixes, so keep them to a safe alphabet
+        return bool(re.fullmatch(r"[a-z0-9][a-z0-9_-]{0,62}", tenant))
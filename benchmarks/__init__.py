@@ -0,0 +1,33 @@
+# benchmarks/__init__.py
+
+import os
+import sys
+import tempfile
+
+# The app uses flat imports from app/, and settings require these variables.
+# Benchmarks never reach a real service, so placeholders are enough.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+BENCHMARK_DIR = tempfile.mkdtemp(prefix="ragify-benchmark-")
+
+for name, value in {
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "OPENAI_API_KEY": "sk-benchmark",
+    "QDRANT_COLLECTION_NAME": "ragify_benchmark",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_REGION": "us-east-2",
+    "AWS_BUCKET_NAME": "ragify-benchmark",
+    "LANGSMITH_ENDPOINT": "http://localhost",
+    "LANGSMITH_API_KEY": "benchmark",
+    "LANGSMITH_PROJECT": "ragify-benchmark",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(name, value)
+
+# These override a local .env so a run never traces, refreshes links or
+# reuses embeddings from an earlier run
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["LINK_REFRESH_ENABLED"] = "false"
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(BENCHMARK_DIR, "embeddings.sqlite3")
+os.environ["NUMPY_INDEX_PATH"] = os.path.join(BENCHMARK_DIR, "vector_index")
@@ -0,0 +1,329 @@
+# benchmarks/run_benchmarks.py
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from config import settings
+from constants import VECTOR_BACKENDS
+from database.clients import ClientRegistry
+from database.qdrant import QdrantDatabase
+from database.s3 import S3Storage
+from langchain_core.documents import Document
+from services.ai_service import AIService
+from utils.async_utils import AsyncUtils
+from utils.chunking_utils import ChunkingUtils
+from utils.token_utils import TokenUtils
+
+from benchmarks.stand_ins import (
+    PageServer,
+    create_fake_llm,
+    create_fake_rewrite_llm,
+    generate_documents,
+    generate_pages,
+    generate_queries,
+    install_stand_ins,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+REPORTED_SETTINGS = [
+    "EMBEDDING_DIMENSIONS",
+    "EMBEDDING_BATCH_SIZE",
+    "EMBEDDING_MAX_CONCURRENT_BATCHES",
+    "EXTRACTION_MAX_FILES",
+    "WEB_FETCH_MAX_CONCURRENCY",
+    "HYBRID_SEARCH_ENABLED",
+    "HYBRID_PREFETCH_LIMIT",
+    "HIERARCHICAL_SEARCH_ENABLED",
+    "HIERARCHICAL_MIN_SOURCES",
+    "HIERARCHICAL_SOURCE_LIMIT",
+    "VECTOR_BACKEND",
+    "QDRANT_COLLECTION_PROFILE",
+    "CONTEXT_TOKEN_BUDGET",
+    "QUERY_REWRITE_ENABLED",
+    "QUERY_EXPANSION_COUNT",
+    "CHUNKING_OVERRIDES",
+    "CHUNKING_BATCH_CHARS",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the Ragify benchmarks against local stand-ins."
+    )
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--words", type=int, default=800, help="Words per document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument(
+        "--embedding-latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated round trip per embeddings request",
+    )
+    parser.add_argument(
+        "--llm-token-latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated delay between streamed characters",
+    )
+    parser.add_argument(
+        "--vector-backend",
+        choices=VECTOR_BACKENDS,
+        default=settings.VECTOR_BACKEND,
+        help="Vector backend to ingest into and search",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Results file, defaults to benchmarks/results/<timestamp>.json",
+    )
+    args = parser.parse_args()
+    if args.queries < 2 or args.prompts < 2:
+        parser.error("--queries and --prompts need at least 2 samples")
+    return args
+
+
+def summarize_latencies(samples: List[float]) -> Dict[str, float]:
+    milliseconds = [sample * 1000 for sample in samples]
+    percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    return {
+        "count": len(milliseconds),
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "max_ms": round(max(milliseconds), 3),
+    }
+
+
+def summarize_throughput(items: int, chunks: int, seconds: float) -> Dict[str, float]:
+    return {
+        "items": items,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "items_per_sec": round(items / seconds, 2),
+        "chunks_per_sec": round(chunks / seconds, 2),
+    }
+
+
+def count_points(qdrant_db: QdrantDatabase) -> int:
+    return qdrant_db.backend.count()
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def benchmark_startup() -> Dict[str, float]:
+    start = time.perf_counter()
+    QdrantDatabase.get_instance()
+    S3Storage.get_instance()
+    AIService.get_instance()
+    timings = {
+        name: round(seconds * 1000, 3)
+        for name, seconds in ClientRegistry.get_timings().items()
+    }
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return timings
+
+
+def benchmark_chunking(args: argparse.Namespace) -> Dict[str, Any]:
+    # Tokens per source byte shows how much the overlap adds to what is embedded
+    documents = [
+        Document(
+            page_content=document["content"].decode("utf-8"),
+            metadata={"source_filename": document["file_name"]},
+        )
+        for document in generate_documents(args.documents, args.words, args.seed)
+    ]
+    source_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+    source_tokens = sum(TokenUtils.count_tokens(doc.page_content) for doc in documents)
+
+    start = time.perf_counter()
+    chunks = [
+        chunk for batch in ChunkingUtils.iter_chunked(documents) for chunk in batch
+    ]
+    seconds = time.perf_counter() - start
+
+    chunk_tokens = [TokenUtils.count_tokens(chunk.page_content) for chunk in chunks]
+    return {
+        **summarize_throughput(len(documents), len(chunks), seconds),
+        "source_bytes": source_bytes,
+        "embedded_tokens": sum(chunk_tokens),
+        "tokens_per_source_byte": round(sum(chunk_tokens) / source_bytes, 4),
+        "overlap_ratio": round(sum(chunk_tokens) / source_tokens - 1, 4),
+        "mean_chunk_tokens": round(statistics.fmean(chunk_tokens), 1),
+        "max_chunk_tokens": max(chunk_tokens),
+    }
+
+
+def benchmark_document_ingestion(args: argparse.Namespace) -> Dict[str, float]:
+    s3 = S3Storage.get_instance()
+    qdrant_db = QdrantDatabase.get_instance()
+    documents = list(generate_documents(args.documents, args.words, args.seed))
+    filenames = s3.upload_files(
+        settings.DEFAULT_TENANT,
+        [
+            {
+                "file_obj": io.BytesIO(document["content"]),
+                "file_name": document["file_name"],
+                "content_type": document["content_type"],
+            }
+            for document in documents
+        ],
+    )
+
+    points_before = count_points(qdrant_db)
+    start = time.perf_counter()
+    qdrant_db.sync_document_embeddings(settings.DEFAULT_TENANT, filenames, [])
+    seconds = time.perf_counter() - start
+    return summarize_throughput(
+        len(filenames), count_points(qdrant_db) - points_before, seconds
+    )
+
+
+def benchmark_webpage_ingestion(args: argparse.Namespace) -> Dict[str, float]:
+    qdrant_db = QdrantDatabase.get_instance()
+    pages = generate_pages(args.pages, args.words, args.seed + 1)
+
+    with PageServer(pages) as server:
+        urls = [f"{server.base_url}{path}" for path in pages]
+        points_before = count_points(qdrant_db)
+        start = time.perf_counter()
+        link_stats = qdrant_db.sync_webpage_embeddings(
+            settings.DEFAULT_TENANT, urls, []
+        )
+        seconds = time.perf_counter() - start
+
+    return summarize_throughput(
+        len(link_stats), count_points(qdrant_db) - points_before, seconds
+    )
+
+
+def benchmark_search(args: argparse.Namespace) -> Dict[str, Any]:
+    qdrant_db = QdrantDatabase.get_instance()
+    queries = generate_queries(args.queries, args.seed + 2)
+
+    # Every query is distinct, so the first pass measures uncached searches
+    # and the second pass measures the search cache
+    results = {}
+    for name in ("uncached", "cached"):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            qdrant_db.search(query, settings.DEFAULT_TENANT)
+            samples.append(time.perf_counter() - start)
+        results[name] = summarize_latencies(samples)
+    return results
+
+
+def measure_responses(
+    ai_service: AIService, prompts: List[str], chat_history: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    # Timed on the async path Chat.py streams from
+    first_token_samples = []
+    total_samples = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        response = AsyncUtils.iterate(
+            ai_service.agenerate_response(prompt, settings.DEFAULT_TENANT, chat_history)
+        )
+        next(response)
+        first_token_samples.append(time.perf_counter() - start)
+        for _ in response:
+            pass
+        total_samples.append(time.perf_counter() - start)
+
+    return {
+        "time_to_first_token": summarize_latencies(first_token_samples),
+        "total_response": summarize_latencies(total_samples),
+    }
+
+
+def benchmark_time_to_first_token(args: argparse.Namespace) -> Dict[str, Any]:
+    ai_service = AIService.get_instance()
+    ai_service.llm = create_fake_llm(args.llm_token_latency_ms / 1000)
+    # Enough distinct rewrites that no turn is served from the search cache
+    queries_per_rewrite = 1 + settings.QUERY_EXPANSION_COUNT
+    ai_service.rewrite_llm = create_fake_rewrite_llm(
+        generate_queries(2 * args.prompts * queries_per_rewrite, args.seed + 4),
+        queries_per_rewrite,
+    )
+    prompts = generate_queries(args.prompts, args.seed + 3)
+
+    # Follow-up turns go through the query rewrite, which is off by default,
+    # to show what it adds to time to first token
+    settings.QUERY_REWRITE_ENABLED = True
+    chat_history = [
+        {"role": "human", "content": prompts[0]},
+        {"role": "ai", "content": "An earlier answer."},
+    ]
+    return {
+        "first_turn": measure_responses(ai_service, prompts, []),
+        # Fresh prompts, so the prompt's own search misses the cache as well
+        "follow_up": measure_responses(
+            ai_service,
+            generate_queries(args.prompts, args.seed + 5),
+            chat_history,
+        ),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+
+    # Every generated page is served from one local host
+    settings.VECTOR_BACKEND = args.vector_backend
+    settings.WEB_FETCH_HOST_DELAY_SECONDS = 0
+    settings.WEB_FETCH_PER_HOST_LIMIT = settings.WEB_FETCH_MAX_CONCURRENCY
+    install_stand_ins(args.embedding_latency_ms / 1000)
+
+    results: Dict[str, Any] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "arguments": vars(args),
+        "settings": {name: getattr(settings, name) for name in REPORTED_SETTINGS},
+        "token_counter": ("approximate" if TokenUtils.is_estimated() else "tiktoken"),
+    }
+    results["startup"] = benchmark_startup()
+    results["chunking"] = benchmark_chunking(args)
+    results["ingestion"] = {
+        "documents": benchmark_document_ingestion(args),
+        "webpages": benchmark_webpage_ingestion(args),
+    }
+    results["search"] = benchmark_search(args)
+    results["generation"] = benchmark_time_to_first_token(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2, default=str)
+
+    print(json.dumps(results, indent=2, default=str))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# benchmarks/stand_ins.py
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List
+
+from botocore.exceptions import ClientError
+from config import settings
+from database.clients import ClientRegistry
+from database.embedding_cache import CachedEmbeddings, EmbeddingCache
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from qdrant_client import QdrantClient
+
+VOCABULARY = (
+    "vector index query chunk embedding latency cache shard replica cluster "
+    "payload filter segment token context retrieval ranking document source "
+    "storage memory thread process network request response stream batch "
+    "config.py ERR-1042 s3 qdrant mongo streamlit pipeline throughput"
+).split()
+
+
+class InMemoryS3Client:
+    # Implements the subset of the boto3 S3 client that S3Storage uses
+    def __init__(self) -> None:
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _put(self, key: str, body: bytes, content_type: str) -> None:
+        with self._lock:
+            self._objects[key] = {
+                "Body": body,
+                "ContentType": content_type,
+                "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+                "LastModified": datetime.now(timezone.utc),
+            }
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        content_type = (ExtraArgs or {}).get("ContentType", "binary/octet-stream")
+        self._put(Key, Fileobj.read(), content_type)
+
+    def copy_object(self, Bucket, CopySource, Key):
+        with self._lock:
+            source = self._objects[CopySource["Key"]]
+        self._put(Key, source["Body"], source["ContentType"])
+
+    def download_fileobj(self, Bucket, Key, Fileobj, Config=None):
+        with self._lock:
+            body = self._objects[Key]["Body"]
+        Fileobj.write(body)
+
+    def head_object(self, Bucket, Key):
+        with self._lock:
+            obj = self._objects.get(Key)
+        if obj is None:
+            raise ClientError(
+                {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject"
+            )
+        return {
+            "ContentLength": len(obj["Body"]),
+            "ContentType": obj["ContentType"],
+            "ETag": obj["ETag"],
+            "LastModified": obj["LastModified"],
+        }
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self._objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        with self._lock:
+            for obj in Delete["Objects"]:
+                self._objects.pop(obj["Key"], None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"memory://{Params['Bucket']}/{Params['Key']}"
+
+    def get_paginator(self, operation_name):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix="", Delimiter=None):
+                with client._lock:
+                    keys = sorted(
+                        key
+                        for key in client._objects
+                        if key.startswith(Prefix)
+                        and not (Delimiter and Delimiter in key[len(Prefix) :])
+                    )
+                for i in range(0, max(len(keys), 1), 1000):
+                    yield {
+                        "Contents": [
+                            {
+                                "Key": key,
+                                "Size": len(client._objects[key]["Body"]),
+                                "ETag": client._objects[key]["ETag"],
+                                "LastModified": client._objects[key]["LastModified"],
+                            }
+                            for key in keys[i : i + 1000]
+                        ]
+                    }
+
+        return Paginator()
+
+
+class LocalQdrantClient(QdrantClient):
+    # Local mode keeps points in plain numpy arrays, so the concurrent batch
+    # upserts the app makes against a server have to take turns here
+    def __init__(self) -> None:
+        super().__init__(location=":memory:")
+        self._lock = threading.RLock()
+
+    def _locked(name: str) -> Any:
+        method = getattr(QdrantClient, name)
+
+        def locked(self: "LocalQdrantClient", *args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                return method(self, *args, **kwargs)
+
+        return locked
+
+    upsert = _locked("upsert")
+    delete = _locked("delete")
+    set_payload = _locked("set_payload")
+    scroll = _locked("scroll")
+    count = _locked("count")
+    retrieve = _locked("retrieve")
+    query_points = _locked("query_points")
+    upload_collection = _locked("upload_collection")
+    del _locked
+
+
+class LocalAsyncQdrantClient:
+    # A local-mode AsyncQdrantClient keeps its own empty collections, so async
+    # calls are routed to the sync client on a worker thread instead
+    def __init__(self, client: LocalQdrantClient) -> None:
+        self.client = client
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.client, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+class FakeEmbeddings(Embeddings):
+    # Deterministic vectors plus an optional per-request delay standing in for
+    # the round trip to the embeddings API
+    def __init__(self, size: int, latency_seconds: float = 0.0) -> None:
+        self.embeddings = DeterministicFakeEmbedding(size=size)
+        self.latency_seconds = latency_seconds
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_seconds)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_seconds)
+        return self.embeddings.embed_query(text)
+
+
+class PageServer:
+    # Serves generated HTML pages on localhost so webpage ingestion runs the
+    # real fetch, parse and rate limiting code
+    def __init__(self, pages: Dict[str, str]) -> None:
+        def handler_factory(*args: Any) -> BaseHTTPRequestHandler:
+            return PageHandler(pages, *args)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler_factory)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self) -> "PageServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def __init__(self, pages: Dict[str, str], *args: Any) -> None:
+        self.pages = pages
+        super().__init__(*args)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        encoded = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+def generate_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choices(VOCABULARY, k=length)).capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def generate_sections(rng: random.Random, words: int) -> str:
+    # Markdown-style headings over a few paragraphs each, like real documents
+    sections = []
+    while words > 0:
+        section_words = min(words, rng.randint(150, 400))
+        paragraphs = []
+        remaining = section_words
+        while remaining > 0:
+            length = min(remaining, rng.randint(40, 120))
+            paragraphs.append(generate_text(rng, length))
+            remaining -= length
+        heading = " ".join(rng.choices(VOCABULARY, k=3)).title()
+        sections.append(f"## {heading}\n\n" + "\n\n".join(paragraphs))
+        words -= section_words
+    return "\n\n".join(sections)
+
+
+def generate_documents(count: int, words: int, seed: int) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "file_name": f"benchmark-{i:05d}.txt",
+            "content": generate_sections(rng, words).encode("utf-8"),
+            "content_type": "text/plain",
+        }
+
+
+def generate_pages(count: int, words: int, seed: int) -> Dict[str, str]:
+    rng = random.Random(seed)
+    return {
+        f"/page-{i:05d}": (
+            f"<html><head><title>Page {i}</title></head>"
+            f"<body><h1>Page {i}</h1>"
+            + "".join(
+                f"<h2>Section {section}</h2><p>{generate_text(rng, 100)}</p>"
+                for section in range(max(1, words // 100))
+            )
+            + "</body></html>"
+        )
+        for i in range(count)
+    }
+
+
+def generate_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(VOCABULARY, k=rng.randint(3, 8))) for _ in range(count)
+    ]
+
+
+def install_stand_ins(embedding_latency_seconds: float = 0.0) -> None:
+    # Registering instances up front means every get_instance() call in the app
+    # picks up a stand-in instead of connecting to a live service
+    qdrant_client = LocalQdrantClient()
+    ClientRegistry._instances.update(
+        {
+            "qdrant_client": qdrant_client,
+            "async_qdrant_client": LocalAsyncQdrantClient(qdrant_client),
+            "s3_client": InMemoryS3Client(),
+            "embeddings": CachedEmbeddings(
+                embeddings=FakeEmbeddings(
+                    settings.EMBEDDING_DIMENSIONS, embedding_latency_seconds
+                ),
+                cache=EmbeddingCache(
+                    path=settings.EMBEDDING_CACHE_PATH,
+                    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                ),
+                namespace=f"benchmark:{settings.EMBEDDING_DIMENSIONS}",
+            ),
+        }
+    )
+
+
+def create_fake_llm(token_latency_seconds: float = 0.0) -> FakeListChatModel:
+    # Streams the canned answer one character at a time
+    return FakeListChatModel(
+        responses=[generate_text(random.Random(0), 120)],
+        sleep=token_latency_seconds or None,
+    )
+
+
+def create_fake_rewrite_llm(queries: List[str], per_answer: int) -> FakeListChatModel:
+    # Answers with a few of the benchmark queries, one per line, in rotation
+    return FakeListChatModel(
+        responses=[
+            "\n".join(queries[i : i + per_answer])
+            for i in range(0, len(queries), per_answer)
+        ]
+    )
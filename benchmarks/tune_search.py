@@ -0,0 +1,382 @@
+# benchmarks/tune_search.py
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from config import settings
+from constants import COLLECTION_PROFILES, TENANT_FIELD
+from database.clients import ClientRegistry
+from database.qdrant import QdrantDatabase
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    SearchParams,
+)
+
+from benchmarks.run_benchmarks import RESULTS_DIR
+from benchmarks.stand_ins import install_stand_ins
+
+SYNTHETIC_COLLECTION_NAME = "ragify_search_tuning"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Sweep hnsw_ef and quantization rescoring at a fixed k and measure "
+            "recall against exact search alongside latency."
+        )
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Qdrant server to tune, e.g. the docker one")
+    target.add_argument("--path", help="Local-mode Qdrant storage directory")
+    parser.add_argument(
+        "--collection",
+        default=None,
+        help="Stored collection to sample; synthetic vectors are used when omitted",
+    )
+    parser.add_argument(
+        "--tenant",
+        default=settings.DEFAULT_TENANT,
+        help="Tenant whose chunks are searched, as every app search is",
+    )
+    parser.add_argument("--synthetic-points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=settings.SEARCH_TOP_K,
+        help="Results per search; recall is measured at this depth, not tuned",
+    )
+    parser.add_argument(
+        "--hnsw-ef", type=int, nargs="+", default=[16, 32, 64, 128, 256]
+    )
+    parser.add_argument(
+        "--oversampling", type=float, nargs="+", default=[1.0, 2.0, 3.0]
+    )
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument(
+        "--latency-budget-ms",
+        type=float,
+        default=50.0,
+        help="Settings whose p95 latency exceeds this are not chosen",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help=f"Write the chosen settings to {settings.SEARCH_TUNING_PATH}",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=list(COLLECTION_PROFILES),
+        default=None,
+        help="Profile the saved settings apply to; inferred from the tuned "
+        "collection when omitted",
+    )
+    parser.add_argument("--output", default=None, help="Full sweep report file")
+    return parser.parse_args()
+
+
+def create_client(args: argparse.Namespace) -> QdrantClient:
+    if args.url:
+        return QdrantClient(url=args.url)
+    return QdrantClient(path=args.path) if args.path else QdrantClient(":memory:")
+
+
+def load_synthetic_collection(
+    client: QdrantClient, args: argparse.Namespace, rng: np.random.Generator
+) -> str:
+    # Clustered unit vectors resemble embeddings far better than uniform noise,
+    # which makes every neighbour almost equally far away
+    settings.QDRANT_COLLECTION_NAME = SYNTHETIC_COLLECTION_NAME
+    settings.HYBRID_SEARCH_ENABLED = False
+    install_stand_ins()
+    ClientRegistry._instances["qdrant_client"] = client
+    if client.collection_exists(SYNTHETIC_COLLECTION_NAME):
+        client.delete_collection(SYNTHETIC_COLLECTION_NAME)
+    QdrantDatabase.get_instance()
+
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    centers = rng.normal(size=(max(args.synthetic_points // 200, 1), dimensions))
+    for start in range(0, args.synthetic_points, 1000):
+        count = min(1000, args.synthetic_points - start)
+        vectors = centers[rng.integers(len(centers), size=count)] + rng.normal(
+            scale=0.6, size=(count, dimensions)
+        )
+        client.upload_collection(
+            collection_name=SYNTHETIC_COLLECTION_NAME,
+            vectors=vectors.astype(np.float32),
+            payload=[{"metadata": {"tenant_id": args.tenant}}] * count,
+            ids=range(start, start + count),
+        )
+    return SYNTHETIC_COLLECTION_NAME
+
+
+def get_tenant_filter(tenant: str) -> Filter:
+    return Filter(
+        must=[FieldCondition(key=TENANT_FIELD, match=MatchValue(value=tenant))]
+    )
+
+
+def sample_queries(
+    client: QdrantClient,
+    collection_name: str,
+    tenant: str,
+    count: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    # Stored vectors with a little noise stand in for queries about stored content
+    points, _ = client.scroll(
+        collection_name=collection_name,
+        scroll_filter=get_tenant_filter(tenant),
+        limit=max(count * 10, 1000),
+        with_payload=False,
+        with_vectors=True,
+    )
+    vectors = np.array(
+        [
+            point.vector if not isinstance(point.vector, dict) else point.vector[""]
+            for point in points
+        ],
+        dtype=np.float32,
+    )
+    queries = vectors[
+        rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    ]
+    queries = queries + rng.normal(scale=0.05 * queries.std(), size=queries.shape)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def search(
+    client: QdrantClient,
+    collection_name: str,
+    tenant: str,
+    query: np.ndarray,
+    k: int,
+    params: SearchParams,
+) -> List[Any]:
+    return client.query_points(
+        collection_name=collection_name,
+        query=query.tolist(),
+        query_filter=get_tenant_filter(tenant),
+        search_params=params,
+        limit=k,
+        with_payload=False,
+    ).points
+
+
+def measure(
+    client: QdrantClient,
+    collection_name: str,
+    tenant: str,
+    queries: np.ndarray,
+    ground_truth: List[List[Any]],
+    k: int,
+    params: SearchParams,
+    repeats: int,
+) -> Dict[str, float]:
+    recalls = []
+    latencies = []
+    for query, truth in zip(queries, ground_truth):
+        expected = {point.id for point in truth[:k]}
+        for _ in range(repeats):
+            start = time.perf_counter()
+            points = search(client, collection_name, tenant, query, k, params)
+            latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(
+            len(expected & {point.id for point in points}) / max(len(expected), 1)
+        )
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "recall": round(statistics.fmean(recalls), 4),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+    }
+
+
+def build_search_params(
+    hnsw_ef: int, rescore: Optional[bool], oversampling: Optional[float]
+) -> SearchParams:
+    return SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=(
+            QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+            if rescore is not None
+            else None
+        ),
+    )
+
+
+def choose_settings(
+    rows: List[Dict[str, Any]], target_recall: float, latency_budget_ms: float
+) -> Optional[Dict[str, Any]]:
+    # Recall here is how closely the index matches exact search at the same k,
+    # so it judges index settings only. The fastest setting that is accurate
+    # enough and within the budget wins.
+    passing = [
+        row
+        for row in rows
+        if row["recall"] >= target_recall and row["p95_ms"] <= latency_budget_ms
+    ]
+    if not passing:
+        return None
+    return min(passing, key=lambda row: row["p95_ms"])
+
+
+def infer_profile(collection_config: Any) -> Optional[str]:
+    # Only a server reports quantization, and the profile is the one whose
+    # quantization and storage match the tuned collection
+    quantization_types = {
+        None: type(None),
+        "scalar": ScalarQuantization,
+        "binary": BinaryQuantization,
+    }
+    matches = [
+        name
+        for name, profile in COLLECTION_PROFILES.items()
+        if isinstance(
+            collection_config.quantization_config,
+            quantization_types[profile["quantization"]],
+        )
+        and bool(collection_config.params.vectors.on_disk) == profile["on_disk"]
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    client = create_client(args)
+
+    if not args.url:
+        print(
+            "Local mode always searches exactly, so hnsw_ef and quantization "
+            "settings have no effect there and nothing can be saved. Use --url "
+            "with a Qdrant server to tune them."
+        )
+
+    collection_name = args.collection or load_synthetic_collection(client, args, rng)
+    collection_config = client.get_collection(collection_name).config
+    quantized = collection_config.quantization_config is not None
+    queries = sample_queries(client, collection_name, args.tenant, args.queries, rng)
+
+    ground_truth = [
+        search(
+            client,
+            collection_name,
+            args.tenant,
+            query,
+            args.k,
+            SearchParams(exact=True),
+        )
+        for query in queries
+    ]
+
+    rescore_options = [True, False] if quantized else [None]
+    oversampling_options = args.oversampling if quantized else [None]
+    rows = []
+    for hnsw_ef, rescore, oversampling in itertools.product(
+        args.hnsw_ef, rescore_options, oversampling_options
+    ):
+        if rescore is False and oversampling not in (None, args.oversampling[0]):
+            # Oversampling only matters when candidates are rescored
+            continue
+
+        params = build_search_params(hnsw_ef, rescore, oversampling)
+        row = {
+            "hnsw_ef": hnsw_ef,
+            "rescore": rescore,
+            "oversampling": oversampling,
+            **measure(
+                client,
+                collection_name,
+                args.tenant,
+                queries,
+                ground_truth,
+                args.k,
+                params,
+                args.repeats,
+            ),
+        }
+        rows.append(row)
+        print(
+            f"hnsw_ef={hnsw_ef:<4} rescore={str(rescore):<5} "
+            f"oversampling={str(oversampling):<4} recall={row['recall']:.4f} "
+            f"p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms"
+        )
+
+    chosen = choose_settings(rows, args.target_recall, args.latency_budget_ms)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "collection": collection_name,
+        "mode": "server" if args.url else "local",
+        "points": client.count(collection_name=collection_name, exact=True).count,
+        "queries": len(queries),
+        "k": args.k,
+        "target_recall": args.target_recall,
+        "latency_budget_ms": args.latency_budget_ms,
+        "results": rows,
+        "chosen": chosen,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"search_tuning_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Sweep report written to {output}")
+
+    if chosen is None:
+        print(
+            f"No configuration reached recall {args.target_recall} within "
+            f"{args.latency_budget_ms}ms p95; consider a faster profile, a lower "
+            "target recall or a larger budget."
+        )
+        return
+
+    print(f"Chosen: {chosen}")
+    if args.save:
+        if not args.url:
+            print("Nothing saved; local mode did not measure any index setting.")
+            return
+
+        profile = args.profile or infer_profile(collection_config)
+        if profile is None:
+            print("Could not infer the collection profile; pass --profile.")
+            return
+        tuning = {
+            "profile": profile,
+            "dimensions": collection_config.params.vectors.size,
+            "hnsw_ef": chosen["hnsw_ef"],
+            "quantization": (
+                {"rescore": chosen["rescore"], "oversampling": chosen["oversampling"]}
+                if chosen["rescore"] is not None
+                else None
+            ),
+            "recall": chosen["recall"],
+            "recall_at_k": args.k,
+            "p95_ms": chosen["p95_ms"],
+            "tuned_at": report["timestamp"],
+        }
+        with open(settings.SEARCH_TUNING_PATH, "w") as tuning_file:
+            json.dump(tuning, tuning_file, indent=2)
+        print(f"Search settings saved to {settings.SEARCH_TUNING_PATH}")
+
+
+if __name__ == "__main__":
+    main()